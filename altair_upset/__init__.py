@@ -1,5 +1,18 @@
 """UpSet plots using Altair."""
 from .original_function import UpSetAltair
+from .cache import CountCache, DiskCache, SpecCache
+from .index import UpSetIndex
+from .profile import explain, profile_spec
+from .sketch import SetSketch
 
 __version__ = "0.1.0"
-__all__ = ["UpSetAltair"]
+__all__ = [
+    "CountCache",
+    "DiskCache",
+    "SetSketch",
+    "SpecCache",
+    "UpSetAltair",
+    "UpSetIndex",
+    "explain",
+    "profile_spec",
+]
@@ -0,0 +1,806 @@
+"""Intersection counting functions for UpSet plots."""
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# Membership keys are stored in an unsigned integer, with the first set in the
+# most significant used bit so that sorted keys follow the same order as
+# `groupby(sets)`.
+MAX_KEY_SETS = 64
+
+# Below this many possible keys, counting uses a dense `np.bincount` table
+# instead of sorting the keys.
+BINCOUNT_MAX_BINS = 1 << 20
+
+# Smallest shard worth handing to a worker when counting in parallel.
+MIN_SHARD_ROWS = 100_000
+
+# Column of membership keys in packed intersection tables, used beyond
+# `MAX_KEY_SETS` sets.
+PACKED_KEY = "_membership_key"
+
+# Inclusive counts use a dense table of 2^n entries per value column.
+INCLUSIVE_MAX_SETS = 24
+
+# Most combinations an inclusive chart draws. There are up to 2^n of them,
+# so beyond a few sets they must be limited by the filters.
+INCLUSIVE_MAX_INTERSECTIONS = 1000
+
+
+def is_binary_membership(data, sets):
+    """Check whether the membership columns only hold 0/1 (or boolean) values.
+
+    Args:
+        data (pd.DataFrame or dict): Input data, or a mapping of set name to a
+            NumPy column
+        sets (list): List of set names
+
+    Returns:
+        bool: True if every column can be packed into a membership key
+    """
+    for s in sets:
+        column = data[s]
+        if not isinstance(column.dtype, np.dtype):
+            return False
+        if column.dtype.kind == "b":
+            continue
+        if column.dtype.kind not in "iuf":
+            return False
+        values = np.asarray(column)
+        if len(values) == 0:
+            continue
+        if column.dtype.kind == "f":
+            if not ((values == 0) | (values == 1)).all():
+                return False
+        elif values.min() < 0 or values.max() > 1:
+            return False
+    return True
+
+
+def key_dtype(n_sets):
+    """Return the narrowest unsigned integer dtype that holds `n_sets` bits."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_sets <= np.iinfo(dtype).bits:
+            return dtype
+    return np.uint64
+
+
+def encode_keys(data, sets):
+    """Pack the membership columns of each row into one integer key.
+
+    Args:
+        data (pd.DataFrame or dict): Input data with 0/1 membership columns
+        sets (list): List of set names
+
+    Returns:
+        np.ndarray: Unsigned integer key per row, see `key_dtype`
+    """
+    dtype = key_dtype(len(sets))
+    keys = np.zeros(row_count(data, sets), dtype=dtype)
+    for s in sets:
+        keys <<= dtype(1)
+        keys |= np.asarray(data[s]).astype(dtype, copy=False)
+    return keys
+
+
+def count_keys(keys, n_sets, weights=None):
+    """Count the occurrences of each distinct membership key.
+
+    Args:
+        keys (np.ndarray): Membership key per row
+        n_sets (int): Number of sets packed into each key
+        weights (np.ndarray): Optional weight per row, summed instead of
+            counting rows
+
+    Returns:
+        tuple: (sorted distinct keys, count per key)
+    """
+    n_bins = 1 << n_sets
+    if n_bins <= max(len(keys), BINCOUNT_MAX_BINS):
+        bins = keys.astype(np.intp)
+        counts = np.bincount(bins, minlength=n_bins)
+        unique = np.flatnonzero(counts)
+        if weights is not None:
+            counts = np.bincount(bins, weights=weights, minlength=n_bins)
+        keys, counts = unique.astype(keys.dtype), counts[unique]
+    elif weights is None:
+        keys, counts = np.unique(keys, return_counts=True)
+    else:
+        keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=weights, minlength=len(keys))
+
+    if weights is not None and weights.dtype.kind in "biu":
+        counts = counts.round().astype(np.int64)
+    return keys, counts
+
+
+def decode_keys(keys, sets):
+    """Unpack membership keys back into one 0/1 column per set.
+
+    Args:
+        keys (np.ndarray): Membership keys
+        sets (list): List of set names
+
+    Returns:
+        pd.DataFrame: One row per key and one column per set
+    """
+    keys = keys.astype(np.uint64, copy=False)
+    shifts = np.arange(len(sets) - 1, -1, -1, dtype=np.uint64)
+    bits = (keys[:, None] >> shifts) & np.uint64(1)
+    return pd.DataFrame(bits.astype(np.int64), columns=sets)
+
+
+def pack_keys(data, sets):
+    """Pack the membership columns of each row into a fixed-width byte key.
+
+    Unlike `encode_keys`, this takes any number of sets. Set `i` is bit
+    `7 - i % 8` of byte `i // 8`, as with `np.packbits`, so keys compare
+    bytewise in the same order as `groupby(sets)`.
+
+    Args:
+        data (pd.DataFrame or dict): Input data with 0/1 membership columns
+        sets (list): List of set names
+
+    Returns:
+        np.ndarray: One `(len(sets) + 7) // 8`-byte void key per row
+    """
+    n_bytes = (len(sets) + 7) // 8
+    packed = np.empty((row_count(data, sets), n_bytes), dtype=np.uint8)
+    for byte in range(n_bytes):
+        column = np.zeros(len(packed), dtype=np.uint8)
+        for bit, s in enumerate(sets[8 * byte : 8 * byte + 8]):
+            column |= np.asarray(data[s]).astype(np.uint8, copy=False) << np.uint8(7 - bit)
+        packed[:, byte] = column
+    return packed.view(f"V{n_bytes}").ravel()
+
+
+def unpack_keys(keys, sets):
+    """Unpack byte keys (as from `pack_keys`) into one 0/1 column per set.
+
+    Args:
+        keys (iterable): Keys as `bytes` objects
+        sets (list): List of set names
+
+    Returns:
+        pd.DataFrame: One int64 column per set
+    """
+    packed = np.frombuffer(b"".join(keys), dtype=np.uint8)
+    packed = packed.reshape(-1, (len(sets) + 7) // 8)
+    bits = np.unpackbits(packed, axis=1, count=len(sets))
+    return pd.DataFrame(bits.astype(np.int64), columns=sets)
+
+
+def packed_degree(keys):
+    """Return the number of sets in each byte key (as from `pack_keys`)."""
+    packed = np.frombuffer(b"".join(keys), dtype=np.uint8)
+    if len(packed) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return _POPCOUNT[packed.reshape(len(keys), -1)].sum(axis=1)
+
+
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def packed_count_table(data, sets, weights=None):
+    """Count intersections on byte keys, for any number of sets.
+
+    Args:
+        data (pd.DataFrame or dict): Input data with 0/1 membership columns
+        sets (list): List of set names
+        weights (np.ndarray): Optional weight per row
+
+    Returns:
+        pd.DataFrame: A `PACKED_KEY` column holding each intersection's membership
+            as `bytes` (see `pack_keys`) and a `count` column, sorted by key
+    """
+    return packed_key_table(pack_keys(data, sets), weights)
+
+
+def packed_key_table(keys, weights=None):
+    """Count the occurrences of each distinct byte key.
+
+    Args:
+        keys (np.ndarray): Void byte key per row, as from `pack_keys`
+        weights (np.ndarray): Optional weight per row
+
+    Returns:
+        pd.DataFrame: A `PACKED_KEY` column and a `count` column, sorted by key
+    """
+    keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    if weights is not None:
+        counts = np.bincount(inverse, weights=weights, minlength=len(keys))
+        if weights.dtype.kind in "biu":
+            counts = counts.round().astype(np.int64)
+    return pd.DataFrame({PACKED_KEY: pd.Series(keys.tolist(), dtype=object), "count": counts})
+
+
+def pack_counts(table, sets):
+    """Turn an intersection table with a column per set into a packed one."""
+    packed = pd.DataFrame({PACKED_KEY: pd.Series(pack_keys(table, sets).tolist(), dtype=object)})
+    for column in table.columns.drop(sets):
+        packed[column] = table[column].to_numpy()
+    return packed
+
+
+def unpack_counts(table, sets):
+    """Turn a packed intersection table into one with a column per set.
+
+    Args:
+        table (pd.DataFrame): A `PACKED_KEY` column and value columns, see
+            `packed_count_table`
+        sets (list): List of set names
+
+    Returns:
+        pd.DataFrame: Set columns and the value columns
+    """
+    unpacked = unpack_keys(table[PACKED_KEY], sets)
+    for column in table.columns.drop(PACKED_KEY):
+        unpacked[column] = table[column].to_numpy()
+    return unpacked
+
+
+def membership_matrix(table, sets):
+    """Return which sets each intersection of a count table (packed or not) is in.
+
+    Returns:
+        np.ndarray: Boolean matrix with one row per intersection and one column per set
+    """
+    if PACKED_KEY in table.columns:
+        packed = np.frombuffer(b"".join(table[PACKED_KEY]), dtype=np.uint8)
+        packed = packed.reshape(len(table), (len(sets) + 7) // 8)
+        return np.unpackbits(packed, axis=1, count=len(sets)).astype(bool)
+    return table[sets].to_numpy() != 0
+
+
+def finish_counts(table, sets, packed=False):
+    """Unpack a packed intersection table unless `packed` is requested."""
+    if PACKED_KEY in table.columns and not packed:
+        return unpack_counts(table, sets)
+    return table
+
+
+def row_count(data, sets):
+    """Return the number of rows of a DataFrame or of a mapping of columns."""
+    if isinstance(data, pd.DataFrame) or not sets:
+        return len(data)
+    return len(data[sets[0]])
+
+
+def slice_rows(data, start, stop):
+    """Return rows `start:stop` of a DataFrame or of a mapping of columns."""
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[start:stop]
+    return {name: column[start:stop] for name, column in data.items()}
+
+
+def can_encode(data, sets):
+    """Check whether the membership columns can be counted as packed keys."""
+    return len(sets) <= MAX_KEY_SETS and is_binary_membership(data, sets)
+
+
+def count_intersections(
+    data, sets, n_jobs=1, executor="thread", weight=None, packed=False
+):
+    """Count the number of rows in each exclusive intersection.
+
+    Produces the same table as `data.groupby(sets).count()` on a zeroed
+    `count` column, but counts packed membership keys instead of grouping
+    on every set column. Beyond `MAX_KEY_SETS` sets, the keys are byte
+    strings (see `pack_keys`). Data that cannot be packed (non-binary or
+    missing values) falls back to the groupby. With `weight`, each row adds
+    its weight to the count of its intersection instead of 1, in the same
+    pass.
+
+    Arrow tables and record batch readers are counted batch by batch on
+    zero-copy NumPy views of the set columns. Polars frames are counted with
+    a Polars group-by. Only the `sets` columns are read in both cases.
+
+    Args:
+        data (pd.DataFrame, pyarrow.Table, pyarrow.RecordBatchReader,
+            polars.DataFrame or polars.LazyFrame): Input data. A mapping of
+            set name to NumPy column is also accepted.
+        sets (list): List of set names
+        n_jobs (int): Number of row shards to count in parallel. None or -1
+            uses every CPU.
+        executor (str or Executor): "thread", "process" or an existing
+            `concurrent.futures.Executor` to run the shards on
+        weight (str): Optional numeric column summed per intersection.
+            Missing weights count as 0.
+        packed (bool): With more than `MAX_KEY_SETS` sets, return a packed
+            table (see `packed_count_table`) instead of one column per set,
+            so that only the intersections that are kept need decoding
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column, one row per
+            non-empty intersection, sorted by membership
+    """
+    if is_polars(data):
+        return count_polars(data, sets, weight)
+    if is_arrow(data, "Table", "RecordBatchReader"):
+        return count_intersections_chunked(
+            arrow_batches(data, input_columns(sets, weight)),
+            sets,
+            n_jobs,
+            executor,
+            weight,
+            packed,
+        )
+
+    n_shards = shard_count(row_count(data, sets), n_jobs)
+    if n_shards > 1:
+        return count_intersections_parallel(
+            data, sets, n_shards, executor, weight, packed
+        )
+    if can_encode(data, sets):
+        return key_count_table(data, sets, row_weights(data, weight))
+    if len(sets) <= MAX_KEY_SETS:
+        return groupby_count(data, sets, weight)
+
+    weights = row_weights(data, weight)
+    if not is_binary_membership(data, sets):
+        # pandas cannot group on this many columns, so rows with missing
+        # values are dropped here, as the groupby would, to pack the rest.
+        complete = ~np.any([pd.isna(np.asarray(data[s])) for s in sets], axis=0)
+        rows = {s: np.asarray(data[s])[complete] for s in sets}
+        if not is_binary_membership(rows, sets):
+            return groupby_count(data, sets, weight)
+        data = rows
+        weights = None if weights is None else weights[complete]
+    table = packed_count_table(data, sets, weights)
+    return table if packed else unpack_counts(table, sets)
+
+
+def input_columns(sets, weight=None):
+    """Return the columns read from the input: the sets and the weight."""
+    return sets if weight is None else sets + [weight]
+
+
+def row_weights(data, weight):
+    """Return the weight column as a NumPy array, with missing weights as 0."""
+    if weight is None:
+        return None
+    weights = np.asarray(data[weight])
+    if weights.dtype.kind not in "biuf":
+        raise TypeError(f"weight column `{weight}` must be numeric, got {weights.dtype}")
+    if weights.dtype.kind == "f":
+        weights = np.nan_to_num(weights)
+    return weights
+
+
+def shard_count(n_rows, n_jobs):
+    """Return how many shards to split `n_rows` rows into for `n_jobs` workers."""
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError(f"n_jobs must be a positive integer, -1 or None, got {n_jobs}")
+    return max(1, min(n_jobs, n_rows // MIN_SHARD_ROWS))
+
+
+def count_intersections_parallel(
+    data, sets, n_shards, executor="thread", weight=None, packed=False
+):
+    """Count intersections of row shards on an executor and merge them.
+
+    Args:
+        data (pd.DataFrame or dict): Input data
+        sets (list): List of set names
+        n_shards (int): Number of row shards
+        executor (str or Executor): "thread", "process" or an existing
+            `concurrent.futures.Executor`
+        weight (str): Optional weight column
+        packed (bool): Return a packed table beyond `MAX_KEY_SETS` sets
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column
+    """
+    bounds = np.linspace(0, row_count(data, sets), n_shards + 1).astype(int)
+    shards = [slice_rows(data, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    count_shard = partial(count_intersections, sets=sets, weight=weight, packed=True)
+
+    if isinstance(executor, Executor):
+        parts = list(executor.map(count_shard, shards))
+    elif executor in ("thread", "process"):
+        pool = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool(max_workers=n_shards) as workers:
+            parts = list(workers.map(count_shard, shards))
+    else:
+        raise ValueError(
+            "executor must be 'thread', 'process' or a concurrent.futures.Executor"
+        )
+    return finish_counts(merge_counts(parts, sets), sets, packed)
+
+
+def key_count_table(data, sets, weights=None):
+    """Build the intersection table of `data` from packed membership keys.
+
+    Args:
+        data (pd.DataFrame or dict): Input data with 0/1 membership columns
+        sets (list): List of set names
+        weights (np.ndarray): Optional weight per row
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column
+    """
+    keys, counts = count_keys(encode_keys(data, sets), len(sets), weights)
+    table = decode_keys(keys, sets)
+    for s in sets:
+        table[s] = table[s].astype(data[s].dtype)
+    table["count"] = counts
+    return table
+
+
+def groupby_count(data, sets, weight=None):
+    """Count the number of rows in each intersection with a pandas groupby.
+
+    Args:
+        data (pd.DataFrame or dict): Input data
+        sets (list): List of set names
+        weight (str): Optional weight column, summed instead of counting rows
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column
+    """
+    weights = row_weights(data, weight)
+    data = pd.DataFrame({s: data[s] for s in sets})
+    if weight is not None:
+        return data.assign(count=weights).groupby(sets)["count"].sum().reset_index()
+    return data.assign(count=0).groupby(sets).count().reset_index()
+
+
+def merge_counts(tables, sets):
+    """Merge partial intersection tables by summing their value columns.
+
+    Args:
+        tables (list): Intersection tables with set columns (or a packed
+            `PACKED_KEY` column) and `count`, plus any other numeric columns to sum
+        sets (list): List of set names
+
+    Returns:
+        pd.DataFrame: Set columns and the summed value columns
+    """
+    if any(PACKED_KEY in t.columns for t in tables):
+        # Mixed packed and unpacked tables (e.g. from a batch with missing
+        # values) are merged packed when possible.
+        if all(PACKED_KEY in t.columns or is_binary_membership(t, sets) for t in tables):
+            tables = [t if PACKED_KEY in t.columns else pack_counts(t, sets) for t in tables]
+        else:
+            tables = [finish_counts(t, sets) for t in tables]
+    data = pd.concat(tables, ignore_index=True)
+    if PACKED_KEY in data.columns:
+        return data.groupby(PACKED_KEY, sort=True).sum().reset_index()
+    values = [c for c in data.columns if c not in sets]
+    if len(sets) > MAX_KEY_SETS and is_binary_membership(data, sets):
+        return unpack_counts(merge_counts([pack_counts(data, sets)], sets), sets)
+    if not can_encode(data, sets):
+        return data.groupby(sets)[values].sum().reset_index()
+
+    keys = encode_keys(data, sets)
+    table = None
+    for column in values:
+        unique, sums = count_keys(keys, len(sets), data[column].to_numpy())
+        if table is None:
+            table = decode_keys(unique, sets)
+            for s in sets:
+                table[s] = table[s].astype(data[s].dtype)
+        table[column] = sums
+    return table
+
+
+def normalize_counts(counts, sets, count_col="count"):
+    """Turn a pre-aggregated table into an intersection table.
+
+    Rows describing the same intersection are summed, and the result is
+    sorted by membership like a table counted from raw rows.
+
+    Args:
+        counts (pd.DataFrame): One row per intersection, with the set columns
+            and a count column
+        sets (list): List of set names
+        count_col (str): Name of the count column
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column
+    """
+    table = pd.DataFrame({s: counts[s] for s in sets})
+    table["count"] = counts[count_col].to_numpy()
+    if (table["count"] < 0).any():
+        raise ValueError(f"`{count_col}` must not contain negative counts")
+    return merge_counts([table], sets)
+
+
+def superset_sums(values, n_sets):
+    """Replace each entry of a dense key-indexed table by the sum over its supersets.
+
+    This is the superset-sum (zeta) transform: one vectorized pass per set
+    adds the entries with that set's bit to the entries without it, in
+    O(n * 2^n) time and in place.
+
+    Args:
+        values (np.ndarray): Array of length 2^n_sets, indexed by membership key
+        n_sets (int): Number of sets packed into each key
+
+    Returns:
+        np.ndarray: `values`, transformed
+    """
+    for bit in range(n_sets):
+        pairs = values.reshape(-1, 2, 1 << bit)
+        pairs[:, 0] += pairs[:, 1]
+    return values
+
+
+def inclusive_counts(counts, sets):
+    """Turn exclusive intersection counts into inclusive ones.
+
+    The inclusive size of a combination of sets counts every element that is
+    in all of those sets, whatever other sets it is in. It is the sum of the
+    exclusive sizes of the combination and of all its supersets.
+
+    Args:
+        counts (pd.DataFrame): Exclusive intersection table, with 0/1 set
+            columns and value columns such as `count`
+        sets (list): List of set names
+
+    Returns:
+        pd.DataFrame: One row per combination with a non-zero inclusive
+            size, in key order, with the same columns
+    """
+    if len(sets) > INCLUSIVE_MAX_SETS:
+        raise ValueError(
+            f"Inclusive intersections support at most {INCLUSIVE_MAX_SETS} sets"
+        )
+    if not is_binary_membership(counts, sets):
+        raise ValueError("Inclusive intersections need 0/1 set membership columns")
+
+    keys = encode_keys(counts, sets)
+    values = {}
+    for column in counts.columns:
+        if column in sets:
+            continue
+        dense = np.zeros(1 << len(sets), dtype=counts[column].dtype)
+        np.add.at(dense, keys, counts[column].to_numpy())
+        values[column] = superset_sums(dense, len(sets))
+
+    kept = np.flatnonzero(np.any([v != 0 for v in values.values()], axis=0))
+    table = decode_keys(kept, sets)
+    for column, dense in values.items():
+        table[column] = dense[kept]
+    return table
+
+
+def as_columns(batch, columns):
+    """Prepare one batch of rows for `count_intersections`.
+
+    Args:
+        batch: A pandas or Polars DataFrame, an Arrow `RecordBatch`/`Table`
+            or a list of records (dicts keyed by column name, or tuples in
+            `columns` order)
+        columns (list): Columns to read, see `input_columns`
+
+    Returns:
+        The batch in a form accepted by `count_intersections`
+    """
+    if is_arrow(batch, "RecordBatch"):
+        return arrow_columns(batch, columns)
+    if isinstance(batch, (list, tuple)):
+        return pd.DataFrame.from_records(batch, columns=columns)
+    return batch
+
+
+def count_intersections_chunked(
+    batches, sets, n_jobs=1, executor="thread", weight=None, packed=False
+):
+    """Count intersections over an iterator of row batches.
+
+    Each batch is counted on its own and merged into a running table, so
+    memory use depends on the number of distinct intersections rather than
+    on the total number of rows.
+
+    Args:
+        batches (iterable): Batches of rows, see `as_columns`
+        sets (list): List of set names
+        n_jobs (int): Number of shards to count each batch in, see
+            `count_intersections`
+        executor (str or Executor): Executor for the shards
+        weight (str): Optional weight column
+        packed (bool): Return a packed table beyond `MAX_KEY_SETS` sets
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column
+    """
+    columns = input_columns(sets, weight)
+    table = None
+    for batch in batches:
+        batch = as_columns(batch, columns)
+        part = count_intersections(batch, sets, n_jobs, executor, weight, packed=True)
+        table = part if table is None else merge_counts([table, part], sets)
+    if table is None:
+        table = groupby_count(pd.DataFrame(columns=columns), sets)
+    return finish_counts(table, sets, packed)
+
+
+def open_matrix(matrix, n_sets, dtype=None):
+    """Map a membership matrix stored on disk, or check one given as an array.
+
+    Args:
+        matrix (str, os.PathLike or np.ndarray): Path to a `.npy` file, or to a
+            raw file with no header if `dtype` is given, or a 2-D array such as
+            an `np.memmap`
+        n_sets (int): Expected number of columns
+        dtype: Element type of a raw file. Its number of rows follows from
+            its size.
+
+    Returns:
+        np.ndarray: 2-D array with one row per element and one column per set,
+            read from disk only where it is accessed
+    """
+    if isinstance(matrix, (str, os.PathLike)):
+        if dtype is None:
+            matrix = np.load(matrix, mmap_mode="r", allow_pickle=False)
+        else:
+            matrix = np.memmap(matrix, dtype=dtype, mode="r")
+            if len(matrix) % n_sets:
+                raise ValueError(f"File size is not a whole number of rows of {n_sets} sets")
+            matrix = matrix.reshape(-1, n_sets)
+    if matrix.ndim != 2 or matrix.shape[1] != n_sets:
+        raise ValueError(
+            f"Expected a matrix with one column per set ({n_sets}), got shape {matrix.shape}"
+        )
+    return matrix
+
+
+def matrix_batches(matrix, sets, chunksize):
+    """Iterate over fixed-size row windows of a membership matrix.
+
+    Each window is a mapping of set name to a view of its column, so only
+    the window's rows are read from a memory-mapped matrix at a time.
+    """
+    for start in range(0, len(matrix), chunksize):
+        window = matrix[start : start + chunksize]
+        yield {s: window[:, i] for i, s in enumerate(sets)}
+
+
+def is_arrow(data, *names):
+    """Check whether `data` is one of the named `pyarrow` classes.
+
+    pyarrow is optional, so it is only looked up if it was already imported.
+    """
+    pa = sys.modules.get("pyarrow")
+    return pa is not None and isinstance(data, tuple(getattr(pa, n) for n in names))
+
+
+def is_polars(data):
+    """Check whether `data` is a Polars DataFrame or LazyFrame."""
+    pl = sys.modules.get("polars")
+    return pl is not None and isinstance(data, (pl.DataFrame, pl.LazyFrame))
+
+
+def is_table(data):
+    """Check whether `data` is a table type accepted by `count_intersections`."""
+    return (
+        isinstance(data, pd.DataFrame)
+        or is_arrow(data, "Table", "RecordBatchReader")
+        or is_polars(data)
+    )
+
+
+def arrow_batches(data, columns):
+    """Iterate over the record batches of an Arrow table or reader."""
+    if is_arrow(data, "Table"):
+        return iter(data.select(columns).to_batches())
+    return iter(data)
+
+
+def arrow_columns(batch, columns):
+    """Return NumPy views of the given columns of an Arrow record batch.
+
+    Numeric columns without nulls are shared with Arrow without copying.
+    Batches with nulls are converted to pandas so that the groupby fallback
+    drops those rows.
+    """
+    arrays = {}
+    for name in columns:
+        column = batch.column(name)
+        if column.null_count:
+            return batch.select(columns).to_pandas()
+        arrays[name] = column.to_numpy(zero_copy_only=False)
+    return arrays
+
+
+def count_polars(data, sets, weight=None):
+    """Count intersections of a Polars DataFrame or LazyFrame with its group-by.
+
+    Args:
+        data (polars.DataFrame or polars.LazyFrame): Input data
+        sets (list): List of set names
+        weight (str): Optional weight column, summed instead of counting rows
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column
+    """
+    pl = sys.modules["polars"]
+    size = pl.len() if weight is None else pl.col(weight).sum()
+    counts = (
+        data.lazy()
+        .select(input_columns(sets, weight))
+        .drop_nulls(sets)
+        .group_by(sets)
+        .agg(size.alias("count"))
+        .sort(sets)
+        .collect()
+    )
+    table = pd.DataFrame({name: counts.get_column(name).to_numpy() for name in counts.columns})
+    if weight is None:
+        table["count"] = table["count"].astype(np.int64)
+    return table
+
+
+def encode_set_memberships(memberships, sets):
+    """Build the membership key of every element from a set-to-elements mapping.
+
+    Element IDs are hashed once with `pd.factorize`, and each set ORs its bit
+    into the keys of its elements, without building a dense element by set
+    frame. Beyond `MAX_KEY_SETS` sets, the bits go into byte keys laid out
+    as by `pack_keys`.
+
+    Args:
+        memberships (dict): Mapping of set name to an iterable of element IDs
+        sets (list): List of set names, in key bit order
+
+    Returns:
+        np.ndarray: One membership key per distinct element, an unsigned
+            integer (see `key_dtype`) or, beyond `MAX_KEY_SETS` sets, a void
+            byte key
+    """
+    columns = []
+    for s in sets:
+        ids = memberships[s]
+        if not isinstance(ids, (np.ndarray, pd.Series, pd.Index)):
+            ids = list(ids)
+        columns.append(pd.Series(ids, dtype=None if len(ids) else object))
+    codes, uniques = pd.factorize(pd.concat(columns, ignore_index=True))
+
+    offsets = np.cumsum([0] + [len(c) for c in columns])
+    members = [codes[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+    members = [set_codes[set_codes >= 0] for set_codes in members]
+
+    if len(sets) > MAX_KEY_SETS:
+        n_bytes = (len(sets) + 7) // 8
+        packed = np.zeros((len(uniques), n_bytes), dtype=np.uint8)
+        for i, set_codes in enumerate(members):
+            packed[set_codes, i // 8] |= np.uint8(1 << (7 - i % 8))
+        return packed.view(f"V{n_bytes}").ravel()
+
+    dtype = key_dtype(len(sets))
+    keys = np.zeros(len(uniques), dtype=dtype)
+    for i, set_codes in enumerate(members):
+        keys[set_codes] |= dtype(1 << (len(sets) - 1 - i))
+    return keys
+
+
+def count_set_memberships(memberships, sets=None, packed=False):
+    """Count exclusive intersections from a set-to-elements mapping.
+
+    Args:
+        memberships (dict): Mapping of set name to an iterable of element IDs
+        sets (list): Sets to count, defaults to every key of `memberships`
+        packed (bool): With more than `MAX_KEY_SETS` sets, return a packed
+            table (see `packed_count_table`) instead of one column per set
+
+    Returns:
+        pd.DataFrame: Set columns and a `count` column, one row per
+            non-empty intersection, sorted by membership
+    """
+    if sets is None:
+        sets = list(memberships)
+    keys = encode_set_memberships(memberships, sets)
+    if len(sets) > MAX_KEY_SETS:
+        table = packed_key_table(keys)
+        return table if packed else unpack_counts(table, sets)
+    keys, counts = count_keys(keys, len(sets))
+    table = decode_keys(keys, sets)
+    table["count"] = counts.astype(np.int64)
+    return table
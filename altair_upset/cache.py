@@ -0,0 +1,489 @@
+"""Memoization of intersection counts and chart specs keyed by a hash of their input."""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import (
+    PACKED_KEY,
+    can_encode,
+    count_intersections,
+    encode_keys,
+    input_columns,
+    is_arrow,
+    is_polars,
+)
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+DiskCacheInfo = namedtuple("DiskCacheInfo", ["hits", "misses", "max_bytes", "currbytes"])
+
+
+def hash_array(values):
+    """Hash the contents of a NumPy array.
+
+    The raw buffer goes through BLAKE2b together with the dtype and the
+    shape, so any change to the values changes the digest. Object arrays
+    are hashed through `pandas.util.hash_array` first.
+
+    Returns:
+        bytes: The digest
+    """
+    values = np.asarray(values)
+    digest = hashlib.blake2b(f"{values.dtype.str}{values.shape}".encode())
+    if values.dtype.hasobject:
+        values = pd.util.hash_array(values.ravel())
+    digest.update(memoryview(np.ascontiguousarray(values).reshape(-1).view(np.uint8)))
+    return digest.digest()
+
+
+def column_values(data, name):
+    """Return one column of a table as a NumPy array."""
+    if isinstance(data, pd.DataFrame):
+        return data[name].to_numpy()
+    if is_arrow(data, "Table", "RecordBatch"):
+        return data.column(name).to_numpy()
+    if is_polars(data):
+        return data.get_column(name).to_numpy()
+    return np.asarray(data[name])
+
+
+def can_fingerprint(data):
+    """Check whether `data` is held in memory and can be read more than once."""
+    if is_polars(data):
+        return not isinstance(data, sys.modules["polars"].LazyFrame)
+    return isinstance(data, (pd.DataFrame, Mapping)) or is_arrow(
+        data, "Table", "RecordBatch"
+    )
+
+
+def fingerprint(data, columns, **options):
+    """Hash the given columns of a table together with aggregation options.
+
+    Only inputs held in memory can be fingerprinted: pandas DataFrames,
+    mappings of columns, Arrow tables and record batches, and eager Polars
+    DataFrames. Readers, iterators and Polars LazyFrames are consumed or
+    computed when read, so they give None.
+
+    When the `sets` option lists 0/1 columns, they are hashed as their
+    packed membership keys (see `aggregation.encode_keys`), 1 to 8 bytes per
+    row instead of every full-width column, so that a cache hit costs less
+    than counting.
+
+    Args:
+        data: Input table
+        columns (list): Columns to hash, in order
+        **options: Values that change the result of the aggregation
+
+    Returns:
+        str: Hexadecimal digest, or None if `data` cannot be fingerprinted
+    """
+    if not can_fingerprint(data):
+        return None
+
+    values = {name: column_values(data, name) for name in columns}
+    digest = hashlib.sha256(type(data).__module__.encode())
+    digest.update(repr(sorted(options.items())).encode())
+    sets = [s for s in options.get("sets", ()) if s in values]
+    if sets and can_encode(values, sets):
+        # The dtypes of the set columns are kept in the count table.
+        digest.update(repr([values[s].dtype.str for s in sets]).encode())
+        digest.update(hash_array(encode_keys(values, sets)))
+        columns = [name for name in columns if name not in sets]
+    for name in columns:
+        digest.update(repr(name).encode())
+        digest.update(hash_array(values[name]))
+    return digest.hexdigest()
+
+
+def count_key(data, sets, weight=None, packed=False):
+    """Return the cache key of the intersection table of `data`, or None."""
+    return fingerprint(
+        data, input_columns(sets, weight), sets=list(sets), weight=weight, packed=packed
+    )
+
+
+def file_fingerprint(path, **options):
+    """Hash the contents of a file together with options.
+
+    Args:
+        path (str or os.PathLike): File to hash
+        **options: Values that change what is computed from the file
+
+    Returns:
+        str: Hexadecimal digest, or None if `path` is not a path (for instance
+            an open file or a URL)
+    """
+    if not isinstance(path, (str, os.PathLike)) or not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256(repr(sorted(options.items())).encode())
+    if os.path.getsize(path):
+        digest.update(hash_array(np.memmap(path, dtype=np.uint8, mode="r")))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Bounded mapping that evicts its least recently used entries.
+
+    Lookups and updates hold a lock, so one cache can be shared by threads.
+
+    Parameters:
+        - maxsize (int): Number of entries kept.
+        - ttl (float): Seconds after which an entry expires, or None to keep
+            entries until they are evicted.
+    """
+
+    def __init__(self, maxsize=32, ttl=None):
+        if maxsize < 0:
+            raise ValueError("maxsize must be at least 0")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the entry stored under `key`, or None, and count the lookup.
+
+        A key of None, used for inputs that cannot be fingerprinted, is
+        always a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting the least recently used entries."""
+        if key is None or self.maxsize == 0:
+            return
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        """Return the hit and miss statistics, like `functools.lru_cache`.
+
+        Returns:
+            CacheInfo: `hits`, `misses`, `maxsize` and `currsize`
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """Drop every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class CountCache(LRUCache):
+    """Least recently used cache of intersection count tables.
+
+    Tables are keyed by a fingerprint of the set (and weight) columns of the
+    input and of the aggregation options, so drawing the same data again,
+    for instance with other styling parameters, skips counting. Hashing
+    reads the input once, without the per-row work of counting.
+
+    Parameters:
+        - maxsize (int): Number of count tables kept. The least recently
+            used table is evicted first.
+        - ttl (float): Seconds after which a table expires, or None.
+
+    Example:
+        cache = CountCache(maxsize=8)
+        chart = UpSetAltair(data, sets=sets, cache=cache)
+        chart = UpSetAltair(data, sets=sets, width=900, cache=cache)
+        cache.info()  # CacheInfo(hits=1, misses=1, maxsize=8, currsize=1)
+    """
+
+    def count(self, data, sets, n_jobs=1, executor="thread", weight=None, packed=False):
+        """Count intersections as `count_intersections`, reusing cached tables.
+
+        Returns:
+            pandas.DataFrame: A copy of the intersection table
+        """
+        return self.memoize(
+            count_key(data, sets, weight, packed),
+            partial(count_intersections, data, sets, n_jobs, executor, weight, packed),
+        )
+
+    def memoize(self, key, compute):
+        """Return the table stored under `key`, or compute and store it.
+
+        Args:
+            key (str): Fingerprint of the table, or None to always compute it
+            compute (callable): Function returning the table
+
+        Returns:
+            pandas.DataFrame: A copy of the table
+        """
+        table = self.get(key)
+        if table is None:
+            table = compute()
+            self.put(key, table)
+        return table.copy()
+
+
+class SpecCache(LRUCache):
+    """Least recently used cache of rendered UpSet plot specifications.
+
+    Specs are keyed by a fingerprint of the set (and weight) columns of the
+    input and of every other `UpSetAltair` parameter, so rendering the same
+    chart again neither counts nor builds any Altair object. They are
+    stored as JSON text.
+
+    Parameters:
+        - maxsize (int): Number of specs kept. The least recently used spec
+            is evicted first.
+        - ttl (float): Seconds after which a spec expires, or None.
+
+    Example:
+        specs = SpecCache(maxsize=64, ttl=600)
+        spec = specs.to_dict(data=data, sets=sets, title="Report")
+    """
+
+    # Parameters that do not change the rendered spec.
+    unkeyed = ("n_jobs", "executor", "cache")
+
+    def to_json(self, data, sets, **kwargs):
+        """Return the Vega-Lite spec of `UpSetAltair(data, sets=sets, **kwargs)` as JSON.
+
+        Returns:
+            str: The JSON text of the spec
+        """
+        from .original_function import UpSetAltair
+
+        options = {k: v for k, v in kwargs.items() if k not in self.unkeyed}
+        key = fingerprint(
+            data, input_columns(sets, kwargs.get("weight")), sets=list(sets), **options
+        )
+        spec = self.get(key)
+        if spec is None:
+            spec = UpSetAltair(data=data, sets=sets, **kwargs).to_json()
+            self.put(key, spec)
+        return spec
+
+    def to_dict(self, data, sets, **kwargs):
+        """Return the Vega-Lite spec of `UpSetAltair(data, sets=sets, **kwargs)`.
+
+        Returns:
+            dict: A new copy of the spec
+        """
+        return json.loads(self.to_json(data=data, sets=sets, **kwargs))
+
+
+class DiskCache:
+    """Cache of intersection count tables stored as files in a directory.
+
+    Tables are written as compressed `.npz` files named after the same
+    fingerprint as `CountCache` uses, so they outlive the process and can
+    be shared by several processes. Files are written under a temporary
+    name and renamed into place, so readers never see a partial table.
+    When the directory grows beyond `max_bytes`, the least recently used
+    tables are deleted.
+
+    Parameters:
+        - directory (str): Directory holding the tables. It is created if
+            needed. Defaults to `~/.cache/altair_upset`.
+        - max_bytes (int): Size the directory is trimmed to after each write.
+
+    Example:
+        cache = DiskCache("/tmp/upset-cache", max_bytes=256 * 2**20)
+        chart = UpSetAltair.from_csv("tests.csv", sets=sets, cache=cache)
+    """
+
+    suffix = ".npz"
+
+    def __init__(self, directory=None, max_bytes=1 << 30):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "altair_upset")
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be at least 0")
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._files())
+
+    def count(self, data, sets, n_jobs=1, executor="thread", weight=None, packed=False):
+        """Count intersections as `count_intersections`, reusing stored tables."""
+        return self.memoize(
+            count_key(data, sets, weight, packed),
+            partial(count_intersections, data, sets, n_jobs, executor, weight, packed),
+        )
+
+    def memoize(self, key, compute):
+        """Return the table stored under `key`, or compute and store it.
+
+        Args:
+            key (str): Fingerprint of the table, or None to always compute it
+            compute (callable): Function returning the table
+
+        Returns:
+            pandas.DataFrame: The table
+        """
+        table = self.get(key)
+        if table is None:
+            table = compute()
+            self.put(key, table)
+        return table
+
+    def get(self, key):
+        """Read the table stored under `key`, or return None, and count the lookup."""
+        table = None
+        if key is not None:
+            path = self._path(key)
+            try:
+                with np.load(path, allow_pickle=False) as stored:
+                    columns = json.loads(str(stored["columns"]))
+                    table = pd.DataFrame(
+                        {c: _from_stored(stored[f"c{i}"]) for i, c in enumerate(columns)}
+                    )
+                _touch(path)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                # Missing, unreadable, or removed by another process.
+                table = None
+        if table is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return table
+
+    def put(self, key, table):
+        """Store `table` under `key`, then trim the directory to `max_bytes`.
+
+        Only tables of plain NumPy columns (no object or extension dtypes)
+        and packed tables are stored.
+        """
+        arrays = {f"c{i}": _to_stored(table[c]) for i, c in enumerate(table.columns)}
+        if key is None or any(a.dtype.hasobject for a in arrays.values()):
+            return
+        arrays["columns"] = np.array(json.dumps(list(table.columns)))
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        _touch(self._path(key))
+        self._trim()
+
+    def info(self):
+        """Return the hit and miss statistics and the size of the directory.
+
+        Returns:
+            DiskCacheInfo: `hits`, `misses`, `max_bytes` and `currbytes`
+        """
+        size = sum(stat.st_size for _, stat in self._files())
+        return DiskCacheInfo(self.hits, self.misses, self.max_bytes, size)
+
+    def clear(self):
+        """Delete every stored table and reset the statistics."""
+        for path, _ in self._files():
+            _remove(path)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                try:
+                    files.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    pass
+        return files
+
+    def _trim(self):
+        files = sorted(self._files(), key=lambda f: f[1].st_mtime_ns)
+        size = sum(stat.st_size for _, stat in files)
+        for path, stat in files:
+            if size <= self.max_bytes:
+                break
+            _remove(path)
+            size -= stat.st_size
+
+
+def _to_stored(column):
+    # Packed membership keys (`bytes` of equal length) are stored as a
+    # fixed-width void array.
+    values = column.to_numpy()
+    if column.name == PACKED_KEY and values.dtype.hasobject and len(values):
+        return np.array(values.tolist(), dtype=f"V{len(values[0])}")
+    return values
+
+
+def _from_stored(values):
+    if values.dtype.kind == "V":
+        return pd.Series(values.tolist(), dtype=object)
+    return values
+
+
+def _touch(path):
+    # The modification time orders the tables for cleanup. It is set from
+    # the clock explicitly, as file system timestamps can be too coarse to
+    # order tables used in quick succession.
+    now = time.time_ns()
+    try:
+        os.utime(path, ns=(now, now))
+    except FileNotFoundError:
+        pass
+
+
+def _remove(path):
+    # Another process may have removed the file already.
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def resolve_cache(cache):
+    """Return the cache to use for a `cache=` argument, or None.
+
+    True selects the shared `count_cache`. False and None disable caching.
+    """
+    if cache is True:
+        return count_cache
+    if cache is False or cache is None:
+        return None
+    return cache
+
+
+# Cache used by `UpSetAltair(..., cache=True)`.
+count_cache = CountCache()
@@ -1,12 +1,13 @@
 """Core chart creation functionality for UpSet plots."""
 import altair as alt
-import pandas as pd
+from .aggregation import is_table
 from .transforms import (
     preprocess_data,
     create_degree_calculation,
     create_set_mappings,
 )
 from .config import configure_chart
+from .datasets import Datasets
 from .components import (
     create_vertical_bar_chart,
     create_matrix_view,
@@ -39,7 +40,8 @@ def UpSetAltair(
     """Create an UpSet plot using Altair.
 
     Parameters:
-        data (pandas.DataFrame): Tabular data containing the membership of each element (row) in
+        data (pandas.DataFrame, pyarrow.Table, pyarrow.RecordBatchReader, polars.DataFrame
+            or polars.LazyFrame): Tabular data containing the membership of each element (row) in
             exclusive intersecting sets (column).
         title (str): Title of the plot
         subtitle (str or list): Subtitle(s) of the plot
@@ -71,8 +73,11 @@ def UpSetAltair(
             "Please provide a pandas DataFrame and a list of set names."
         )
 
-    if not isinstance(data, pd.DataFrame):
-        raise TypeError(f"data must be a pandas DataFrame, got {type(data)}")
+    if not is_table(data):
+        raise TypeError(
+            "data must be a pandas DataFrame, pyarrow Table or RecordBatchReader, "
+            f"or a polars DataFrame or LazyFrame, got {type(data)}"
+        )
 
     if not isinstance(sets, list):
         raise TypeError(f"sets must be a list of column names, got {type(sets)}")
@@ -96,9 +101,13 @@ def UpSetAltair(
     selections = create_selections()
     legend_selection, color_selection, opacity_selection = selections
 
-    # Create base chart with transformations
-    base = (
-        alt.Chart(alt.Data(values=processed_data["data"].to_dict("records"), name="source"))
+    # Create the transformations. Every table is stored once at the top level
+    # and referenced by name in the layers. The transformations are set on the
+    # top-level chart, so Vega runs them once for every component.
+    datasets = Datasets()
+    source = datasets.add(processed_data["data"])
+    pipeline = (
+        alt.Chart()
         .transform_filter(legend_selection)
         .transform_pivot(
             "set",
@@ -118,12 +127,13 @@ def UpSetAltair(
         )
         .transform_fold(sets, as_=["set", "is_intersect"])
         .transform_lookup(
-            lookup="set", from_=alt.LookupData(set_to_abbre, "set", ["set_abbre"])
+            lookup="set", from_=alt.LookupData(datasets.add(set_to_abbre), "set", ["set_abbre"])
         )
         .transform_lookup(
-            lookup="set", from_=alt.LookupData(set_to_order, "set", ["set_order"])
+            lookup="set", from_=alt.LookupData(datasets.add(set_to_order), "set", ["set_order"])
         )
     )
+    base = alt.Chart()
 
     # Calculate dimensions
     matrix_width = width - horizontal_bar_chart_width
@@ -168,9 +178,12 @@ def UpSetAltair(
         vertical_bar_chart,
         alt.hconcat(matrix_view, horizontal_bar_chart, spacing=20),
         spacing=20,
+        data=source,
+        transform=pipeline.transform,
     ).resolve_scale(y="shared")
 
     # Configure and return
+    chart = datasets.attach(chart)
     chart = configure_chart(chart, width, height)
     if title:
         chart = chart.properties(
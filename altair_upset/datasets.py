@@ -0,0 +1,130 @@
+"""Tables shared by the layers of an UpSet plot."""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import altair as alt
+from altair.utils.data import limit_rows, sanitize_dataframe, to_values
+
+DATA_MODES = ("inline", "url")
+DATA_FORMATS = ("json", "csv")
+
+
+def dataset_name(values):
+    """Name a table after the hash of its records, as Altair does.
+
+    Args:
+        values (list): Records of the table
+
+    Returns:
+        str: "data-" followed by the MD5 hex digest of the records' JSON
+    """
+    values_json = json.dumps(values, sort_keys=True)
+    return "data-" + hashlib.md5(values_json.encode()).hexdigest()
+
+
+def write_once(path, text):
+    """Write `text` to `path` unless the file exists.
+
+    Files are named after their contents, so an existing file already holds
+    `text`. The file is written under a temporary name and moved in place,
+    so readers never see a partial file.
+    """
+    path = Path(path)
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class Datasets:
+    """The tables of one chart, each stored once.
+
+    Layers reference tables by name or URL only, so the size of a spec does
+    not depend on how many layers draw (or look up) the same table, nor on
+    whether Altair's own dataset consolidation is enabled. Tables are named
+    after their contents, so identical tables are stored once and charts
+    concatenated by the user do not clash.
+
+    Parameters:
+        - mode (str): "inline" stores the records in the top-level `datasets`
+            block of the chart. "url" writes each table to a sidecar file in
+            `directory` and references it by URL, which keeps saved charts and
+            notebooks small and lets browsers cache the data.
+        - directory (str or Path): Where "url" mode writes the files.
+        - url (str): URL of `directory` as seen from the rendered chart.
+            Defaults to `directory` itself, which suits charts saved or
+            displayed from the working directory.
+        - data_format (str): "json" or "csv" sidecar files.
+
+    Example:
+        datasets = Datasets()
+        chart = alt.Chart(datasets.add(frame)).mark_bar()
+        chart = datasets.attach(chart)
+    """
+
+    def __init__(self, mode="inline", directory="upset_data", url=None, data_format="json"):
+        if mode not in DATA_MODES:
+            raise ValueError('data_mode must be "inline" or "url"')
+        if data_format not in DATA_FORMATS:
+            raise ValueError('data_format must be "json" or "csv"')
+        self.mode = mode
+        self.directory = Path(directory)
+        self.url = (self.directory.as_posix() if url is None else str(url)).rstrip("/")
+        self.data_format = data_format
+        self.values = {}
+
+    def add(self, data):
+        """Store a table and return a reference to it.
+
+        In "inline" mode, tables over the active data transformer's
+        `max_rows` raise `altair.MaxRowsError`, like data passed to
+        `alt.Chart`. Sidecar files are not limited, like those of Altair's
+        "json" data transformer.
+
+        Args:
+            data (pd.DataFrame): Table to store
+
+        Returns:
+            alt.NamedData or alt.UrlData: Reference to the table for
+                `alt.Chart` or `alt.LookupData`
+        """
+        if self.mode == "inline":
+            max_rows = alt.data_transformers.options.get("max_rows", 5000)
+            data = limit_rows(data, max_rows=max_rows)
+        elif self.data_format == "csv":
+            return self._add_csv(data)
+
+        values = to_values(data)["values"]
+        name = dataset_name(values)
+        if self.mode == "inline":
+            self.values[name] = values
+            return alt.NamedData(name=name)
+        write_once(self.directory / f"{name}.json", json.dumps(values, sort_keys=True))
+        return alt.UrlData(url=f"{self.url}/{name}.json", format={"type": "json"})
+
+    def _add_csv(self, data):
+        # CSV values are strings unless parsed. Sanitizing turns integer
+        # columns into objects, so types are read first.
+        # Booleans are written as 0 and 1, since "False" would parse as true.
+        data = data.astype({c: "uint8" for c in data.columns if data[c].dtype.kind == "b"})
+        parse = {c: "number" for c in data.columns if data[c].dtype.kind in "iuf"}
+        text = sanitize_dataframe(data).to_csv(index=False)
+        name = "data-" + hashlib.md5(text.encode()).hexdigest()
+        write_once(self.directory / f"{name}.csv", text)
+        return alt.UrlData(url=f"{self.url}/{name}.csv", format={"type": "csv", "parse": parse})
+
+    def attach(self, chart):
+        """Add the inline tables to the `datasets` block of a top-level chart."""
+        if not self.values:
+            return chart
+        return chart.properties(datasets=self.values)
@@ -0,0 +1,111 @@
+"""Incrementally updated intersection counts for UpSet plots."""
+from .aggregation import (
+    as_columns,
+    count_intersections,
+    groupby_count,
+    input_columns,
+    is_arrow,
+    merge_counts,
+)
+from .original_function import _upsetaltair_chart
+
+
+class UpSetIndex:
+    """Intersection count table that absorbs appended and removed rows.
+
+    Each update counts only the new batch and merges it into the stored
+    table, so its cost depends on the batch size and on the number of
+    intersections, not on how many rows were added before.
+
+    Parameters:
+        - sets (list): List of set names to count.
+        - weight (str): Optional numeric column summed instead of counting rows.
+        - n_jobs (int): Number of row shards to count each batch in.
+        - executor (str or concurrent.futures.Executor): Executor for the shards.
+
+    Example:
+        index = UpSetIndex(sets=["A", "B", "C"])
+        index.add(first_batch)
+        index.add(second_batch)
+        chart = index.chart(title="Live UpSet")
+    """
+
+    def __init__(self, sets, weight=None, n_jobs=1, executor="thread"):
+        self.sets = list(sets)
+        self.weight = weight
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self._table = None
+
+    @property
+    def counts(self):
+        """pandas.DataFrame: The current intersection table, one row per intersection."""
+        if self._table is None:
+            return groupby_count({s: [] for s in self.sets}, self.sets)
+        return self._table[self.sets + ["count"]].copy()
+
+    def add(self, batch):
+        """Count a batch of rows into the index.
+
+        Parameters:
+            - batch: Rows in any form accepted by `UpSetAltair` or `UpSetAltair.from_batches`.
+
+        Returns:
+            UpSetIndex: The index itself, to allow chaining.
+        """
+        part = self._count(batch)
+        if self._table is not None:
+            part = merge_counts([self._table, part], self.sets)
+        self._table = part
+        return self
+
+    def remove(self, batch):
+        """Subtract a batch of previously added rows from the index.
+
+        Intersections left without rows are dropped.
+
+        Parameters:
+            - batch: Rows in any form accepted by `UpSetAltair` or `UpSetAltair.from_batches`.
+
+        Returns:
+            UpSetIndex: The index itself, to allow chaining.
+        """
+        if self._table is None:
+            raise ValueError("Cannot remove rows that were never added to the index")
+        part = self._count(batch)
+        value_columns = [c for c in part.columns if c not in self.sets]
+        part[value_columns] = -part[value_columns]
+        table = merge_counts([self._table, part], self.sets)
+
+        rows = table[self._rows_column]
+        if (rows < 0).any():
+            raise ValueError("Cannot remove rows that were never added to the index")
+        self._table = table[rows > 0].reset_index(drop=True)
+        return self
+
+    def chart(self, **kwargs):
+        """Draw the UpSet plot of the current counts.
+
+        Parameters:
+            - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+        """
+        return _upsetaltair_chart(self.counts, sets=self.sets, **kwargs)
+
+    @property
+    def _rows_column(self):
+        # Weighted counts can sum to zero while rows remain, so rows are
+        # tracked separately.
+        return "count" if self.weight is None else "rows"
+
+    def _count(self, batch):
+        if is_arrow(batch, "RecordBatchReader"):
+            # Weighted updates read the batch twice.
+            batch = batch.read_all()
+        batch = as_columns(batch, input_columns(self.sets, self.weight))
+        table = count_intersections(
+            batch, self.sets, self.n_jobs, self.executor, self.weight
+        )
+        if self.weight is not None:
+            rows = count_intersections(batch, self.sets, self.n_jobs, self.executor)
+            table["rows"] = rows["count"].to_numpy()
+        return table
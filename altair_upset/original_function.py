@@ -1,5 +1,29 @@
 import pandas as pd
 import altair as alt
+from .aggregation import (
+    INCLUSIVE_MAX_INTERSECTIONS,
+    count_intersections,
+    count_intersections_chunked,
+    count_set_memberships,
+    finish_counts,
+    inclusive_counts,
+    input_columns,
+    matrix_batches,
+    normalize_counts,
+    open_matrix,
+)
+from .cache import file_fingerprint, resolve_cache
+from .datasets import Datasets
+from .sketch import sketch_intersections
+from .transforms import (
+    compact_counts,
+    create_membership_calculation,
+    expected_sizes,
+    filter_intersections,
+    layout_counts,
+    melt_counts,
+    set_sizes,
+)
 
 
 def upsetaltair_top_level_configuration(chart, legend_orient="top", legend_symbol_size=500):
@@ -63,12 +87,30 @@ def UpSetAltair(
     horizontal_bar_size=20,
     vertical_bar_label_size=16,
     vertical_bar_padding=20,
+    top_k=None,
+    min_size=None,
+    min_degree=None,
+    max_degree=None,
+    other=False,
+    n_jobs=1,
+    executor="thread",
+    weight=None,
+    cache=False,
+    intersection_mode="exclusive",
+    deviation=False,
+    layout="vega",
+    payload="long",
+    data_mode="inline",
+    data_dir="upset_data",
+    data_url=None,
+    data_format="json",
 ):
     """This function generates Altair-based interactive UpSet plots.
 
     Parameters:
         - data (pandas.DataFrame): Tabular data containing the membership of each element (row) in
-            exclusive intersecting sets (column).
+            exclusive intersecting sets (column). A pyarrow Table or RecordBatchReader, or a
+            polars DataFrame or LazyFrame, is read without converting it to pandas.
         - sets (list): List of set names of interest to show in the UpSet plots.
             This list reflects the order of sets to be shown in the plots as well.
         - abbre (list): Abbreviated set names.
@@ -86,11 +128,136 @@ def UpSetAltair(
         - horizontal_bar_size (int): Height of bars in the horizontal bar chart.
         - vertical_bar_label_size (int): Font size of texts in the vertical bar chart on the top.
         - vertical_bar_padding (int): Gap between a pair of bars in the vertical bar charts.
+        - top_k (int): Only draw the `top_k` largest intersections.
+        - min_size (number): Only draw intersections of at least this size.
+        - min_degree (int): Only draw intersections of at least this many sets.
+        - max_degree (int): Only draw intersections of at most this many sets.
+        - other (bool): Add an "Other" bar summing the intersections left out by the filters
+            above. It has no set membership, is drawn last and is labelled "Other" in the
+            matrix. The Set Size bars always give the size of each set, including the
+            intersections left out.
+        - n_jobs (int): Number of row shards to count intersections on in parallel.
+            None or -1 uses every CPU.
+        - executor (str or concurrent.futures.Executor): "thread", "process" or an existing
+            executor to count the shards on.
+        - weight (str): Numeric column to sum as the size of each intersection (and set)
+            instead of counting rows.
+        - cache (bool, CountCache or DiskCache): Reuse the intersection counts of earlier calls
+            on the same data, for instance when only styling parameters change. True uses the
+            shared `altair_upset.cache.count_cache`.
+        - intersection_mode (str): "exclusive" counts each element in the one intersection of
+            exactly the sets it belongs to. "inclusive" counts it in every combination of
+            the sets it belongs to, so a bar gives the size of A ∩ B whatever other sets the
+            elements are in. Up to 24 sets are supported. The Set Size bars then come from the
+            single-set combinations. At most 1,000 combinations are drawn, so beyond 9 sets
+            they must be limited with `top_k`, `min_size` or `max_degree`.
+        - deviation (bool): Add a bar chart of the deviation of each intersection from its
+            expected size if the sets were independent, as in the original UpSet paper. The
+            expected size and the deviation are also shown in the tooltip.
+        - layout (str): "vega" ships the intersection counts and lets Vega-Lite pivot, rank and
+            fold them in the browser, so that hiding sets from the legend merges the
+            intersections that only differ by those sets. "precomputed" does that layout in
+            Python and ships the final rows (with degree, rank, set order and abbreviation,
+            and set sizes), so each layer only encodes them. This renders much faster for
+            many sets or intersections; hiding a set then only removes its row and bar.
+        - payload (str): Format of the intersection table shipped with the "vega" layout.
+            "long" has one row per intersection and set. "compact" has one row per
+            intersection, with its sets as a string of 0s and 1s that Vega-Lite reads back,
+            which is about as many times smaller as there are sets.
+        - data_mode (str): "inline" embeds the chart's tables in its spec. "url" writes them to
+            sidecar files named after their contents, and references them by URL, so that saved
+            charts and notebooks stay small and browsers can cache the data.
+        - data_dir (str or Path): Directory of the sidecar files.
+        - data_url (str): URL of `data_dir` as seen from the rendered chart. Defaults to
+            `data_dir`, relative to the page the chart is displayed or saved in.
+        - data_format (str): "json" or "csv" sidecar files.
     """
 
     if (data is None) or (sets is None):
         print("No data and/or a list of sets are provided")
         return
+
+    cache = resolve_cache(cache)
+    count = count_intersections if cache is None else cache.count
+
+    return _upsetaltair_chart(
+        count(data, sets, n_jobs=n_jobs, executor=executor, weight=weight, packed=True),
+        title=title,
+        subtitle=subtitle,
+        sets=sets,
+        abbre=abbre,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        width=width,
+        height=height,
+        height_ratio=height_ratio,
+        horizontal_bar_chart_width=horizontal_bar_chart_width,
+        color_range=color_range,
+        highlight_color=highlight_color,
+        glyph_size=glyph_size,
+        set_label_bg_size=set_label_bg_size,
+        line_connection_size=line_connection_size,
+        horizontal_bar_size=horizontal_bar_size,
+        vertical_bar_label_size=vertical_bar_label_size,
+        vertical_bar_padding=vertical_bar_padding,
+        top_k=top_k,
+        min_size=min_size,
+        min_degree=min_degree,
+        max_degree=max_degree,
+        other=other,
+        intersection_mode=intersection_mode,
+        deviation=deviation,
+        layout=layout,
+        payload=payload,
+        data_mode=data_mode,
+        data_dir=data_dir,
+        data_url=data_url,
+        data_format=data_format,
+    )
+
+
+def _upsetaltair_chart(
+    data,
+    title="",
+    subtitle="",
+    sets=None,
+    abbre=None,
+    sort_by="frequency",
+    sort_order="ascending",
+    width=1200,
+    height=700,
+    height_ratio=0.6,
+    horizontal_bar_chart_width=300,
+    color_range=["#55A8DB", "#3070B5", "#30363F", "#F1AD60", "#DF6234", "#BDC6CA"],
+    highlight_color="#EA4667",
+    glyph_size=200,
+    set_label_bg_size=1000,
+    line_connection_size=2,
+    horizontal_bar_size=20,
+    vertical_bar_label_size=16,
+    vertical_bar_padding=20,
+    top_k=None,
+    min_size=None,
+    min_degree=None,
+    max_degree=None,
+    other=False,
+    intersection_mode="exclusive",
+    deviation=False,
+    layout="vega",
+    payload="long",
+    data_mode="inline",
+    data_dir="upset_data",
+    data_url=None,
+    data_format="json",
+):
+    """Build the UpSet plot from an intersection count table.
+
+    Parameters:
+        - data (pandas.DataFrame): One row per intersection, with the `sets` columns and
+            a `count` column, as returned by `count_intersections`.
+
+    The remaining parameters are described in `UpSetAltair`.
+    """
     if (height_ratio < 0) or (1 < height_ratio):
         print("height_ratio set to 0.5")
         height_ratio = 0.5
@@ -100,28 +267,75 @@ def UpSetAltair(
             "Dropping the `abbre` list because the lengths of `sets` and `abbre` are not identical."
         )
 
+    if intersection_mode not in ("exclusive", "inclusive"):
+        raise ValueError('intersection_mode must be "exclusive" or "inclusive"')
+    inclusive = intersection_mode == "inclusive"
+    if inclusive and other:
+        raise ValueError("`other` cannot sum inclusive intersections, which overlap")
+    if layout not in ("vega", "precomputed"):
+        raise ValueError('layout must be "vega" or "precomputed"')
+    precomputed = layout == "precomputed"
+    if payload not in ("long", "compact"):
+        raise ValueError('payload must be "long" or "compact"')
+    if precomputed and payload == "compact":
+        raise ValueError('The "compact" payload is for the "vega" layout')
+    compact = payload == "compact"
+    datasets = Datasets(data_mode, data_dir, data_url, data_format)
+
     """
     Data Preprocessing
     """
-    data["count"] = 0
-    data = data[sets + ["count"]]
-    data = data.groupby(sets).count().reset_index()
-
-    data["intersection_id"] = data.index
-    data["degree"] = data[sets].sum(axis=1)
-    data = data.sort_values(
-        by=["count"], ascending=True if sort_order == "ascending" else False
+    if deviation:
+        # Expected sizes are computed on the complete table, before filtering.
+        data = data.assign(expected=expected_sizes(data, sets))
+    has_error = "error" in data.columns
+    if has_error:
+        # Estimated sizes carry an error margin. Margins of intersections
+        # that are added up combine as the square root of the sum of squares.
+        data = data.assign(error=data["error"] ** 2).rename(columns={"error": "error_sq"})
+    # Set sizes are computed on the complete table too, so filters do not shrink them.
+    sizes = set_sizes(data, sets)
+    if inclusive:
+        data = inclusive_counts(data, sets)
+    data = filter_intersections(
+        data,
+        sets,
+        top_k=top_k,
+        min_size=min_size,
+        min_degree=min_degree,
+        max_degree=max_degree,
+        other=other,
     )
-
-    data = pd.melt(data, id_vars=["intersection_id", "count", "degree"])
-    data = data.rename(columns={"variable": "set", "value": "is_intersect"})
+    n_combinations = len(data) - int((data[sets] == 0).all(axis=1).sum()) if inclusive else 0
+    if n_combinations > INCLUSIVE_MAX_INTERSECTIONS:
+        raise ValueError(
+            f"Inclusive mode gives {n_combinations:,} combinations of these sets, more than the "
+            f"{INCLUSIVE_MAX_INTERSECTIONS:,} that can be drawn. Limit them with `top_k`, "
+            "`min_size` or `max_degree`."
+        )
+    has_other = "other" in data.columns
+    data = finish_counts(data, sets)
+    n_intersections = len(data)
 
     if abbre == None:
         abbre = sets
 
+    if precomputed:
+        if has_error:
+            data = data.assign(error=data["error_sq"] ** 0.5).drop(columns="error_sq")
+        if deviation:
+            data = data.assign(deviation=data["count"] - data["expected"])
+        data, set_data = layout_counts(
+            data, sets, abbre, sort_by, sort_order, inclusive, sizes
+        )
+    elif compact:
+        data = compact_counts(data, sets)
+    else:
+        data = melt_counts(data, sets, sort_order)
+
     set_to_abbre = pd.DataFrame(
         [[sets[i], abbre[i]] for i in range(len(sets))], columns=["set", "set_abbre"]
-    )
+    ).assign(set_size=sizes)
     set_to_order = pd.DataFrame(
         [[sets[i], 1 + sets.index(sets[i])] for i in range(len(sets))],
         columns=["set", "set_order"],
@@ -145,11 +359,15 @@ def UpSetAltair(
     """
     vertical_bar_chart_height = height * height_ratio
     matrix_height = height - vertical_bar_chart_height
+    # The deviation bars take a quarter of the height of the vertical bars.
+    deviation_chart_height = vertical_bar_chart_height / 4 if deviation else 0
+    vertical_bar_chart_height -= deviation_chart_height
     matrix_width = width - horizontal_bar_chart_width
 
-    vertical_bar_size = min(
-        30,
-        width / len(data["intersection_id"].unique().tolist()) - vertical_bar_padding,
+    # Bars keep a width of at least one pixel, however many intersections are drawn.
+    vertical_bar_size = max(
+        1,
+        min(30, width / max(1, n_intersections) - vertical_bar_padding),
     )
 
     main_color = "#3A3A3A"
@@ -163,75 +381,135 @@ def UpSetAltair(
         "white" if is_show_horizontal_bar_label_bg else "black"
     )
 
-    x_sort = alt.Sort(
-        field="count" if sort_by == "frequency" else "degree", order=sort_order
+    sort_field = "count" if sort_by == "frequency" else "degree"
+    if has_other and not precomputed:
+        # The "Other" bucket goes last whatever the sort order.
+        sort_key = {
+            "sort_key": f"datum['other'] == 1 ? "
+            f"{'-1' if sort_order == 'descending' else 'MAX_VALUE'} : datum['{sort_field}']"
+        }
+        sort_field = "sort_key"
+    else:
+        sort_key = {}
+    x_sort = (
+        # Intersection ids are already ranked.
+        "ascending"
+        if precomputed
+        else alt.Sort(field=sort_field, order=sort_order)
     )
     tooltip = [
         alt.Tooltip("max(count):Q", title="Cardinality"),
         alt.Tooltip("degree:Q", title="Degree"),
     ]
+    if has_error:
+        tooltip.insert(1, alt.Tooltip("max(error):Q", title="± Error (95%)", format=".0f"))
+    if deviation:
+        tooltip[-1:-1] = [
+            alt.Tooltip("max(expected):Q", title="Expected", format=".1f"),
+            alt.Tooltip("max(deviation):Q", title="Deviation", format="+.1f"),
+        ]
+    # Columns carried along with each intersection besides its sets and count.
+    extra_fields = (
+        (["other"] if has_other else [])
+        + (["error_sq"] if has_error else [])
+        + (["expected"] if deviation else [])
+    )
+    aggregate = "max" if inclusive else "sum"
 
     """
     Plots
     """
     # To use native interactivity in Altair, we are using the data transformation functions
     # supported in Altair.
-    base = (
-        alt.Chart(data)
-        .transform_filter(legend_selection)
-        .transform_pivot(
-            # Right before this operation, columns should be:
-            # `count`, `set`, `is_intersect`, (`intersection_id`, `degree`, `set_order`, `set_abbre`)
-            # where (fields with brackets) should be dropped and recalculated later.
-            "set",
-            op="max",
-            groupby=["intersection_id", "count"],
-            value="is_intersect",
-        )
-        .transform_aggregate(
-            # count, set1, set2, ...
-            count="sum(count)",
-            groupby=sets,
-        )
-        .transform_calculate(
-            # count, set1, set2, ...
-            degree=degree_calculation
-        )
-        .transform_filter(
-            # count, set1, set2, ..., degree
-            alt.datum["degree"] != 0
-        )
-        .transform_window(
-            # count, set1, set2, ..., degree
-            intersection_id="row_number()",
-            frame=[None, None],
-        )
-        .transform_fold(
-            # count, set1, set2, ..., degree, intersection_id
-            sets,
-            as_=["set", "is_intersect"],
-        )
-        .transform_lookup(
-            # count, set, is_intersect, degree, intersection_id
-            lookup="set",
-            from_=alt.LookupData(set_to_abbre, "set", ["set_abbre"]),
-        )
-        .transform_lookup(
-            # count, set, is_intersect, degree, intersection_id, set_abbre
-            lookup="set",
-            from_=alt.LookupData(set_to_order, "set", ["set_order"]),
-        )
-        .transform_filter(
-            # Make sure to remove the filtered sets.
-            legend_selection
-        )
-        .transform_window(
-            # count, set, is_intersect, degree, intersection_id, set_abbre
-            set_order="distinct(set)",
-            frame=[None, 0],
-            sort=[{"field": "set_order"}],
+    # Every table is stored once, at the top level or in a sidecar file, and referenced
+    # by name or URL in the layers.
+    # The `pipeline` transforms are set on the top-level chart, so Vega runs them once
+    # and every view below only adds its own filters and encodings.
+    source = datasets.add(data)
+    if precomputed:
+        pipeline = alt.Chart().transform_filter(legend_selection)
+        set_base = alt.Chart(datasets.add(set_data)).transform_filter(legend_selection)
+    else:
+        if compact:
+            pipeline = alt.Chart().transform_calculate(
+                # `members`, `count`, ...
+                # Sets hidden from the legend are read as 0.
+                **create_membership_calculation(sets, legend_selection.name)
+            )
+        else:
+            pipeline = (
+                alt.Chart()
+                .transform_filter(legend_selection)
+                .transform_pivot(
+                    # Right before this operation, columns should be:
+                    # `count`, `set`, `is_intersect`, (`intersection_id`, `degree`, `set_order`, `set_abbre`)
+                    # where (fields with brackets) should be dropped and recalculated later.
+                    "set",
+                    op="max",
+                    groupby=["intersection_id", "count"] + extra_fields,
+                    value="is_intersect",
+                )
+            )
+        pipeline = (
+            pipeline.transform_aggregate(
+                # count, set1, set2, ...
+                # When sets are hidden from the legend, exclusive intersections
+                # that only differ by those sets add up, while the inclusive size
+                # of the remaining combination is the largest of them.
+                count=f"{aggregate}(count)",
+                **{field: f"{aggregate}({field})" for field in extra_fields if field != "other"},
+                groupby=sets + (["other"] if has_other else []),
+            )
+            .transform_calculate(
+                # count, set1, set2, ...
+                degree=degree_calculation,
+                **({"error": "sqrt(datum['error_sq'])"} if has_error else {}),
+                **({"deviation": "datum['count'] - datum['expected']"} if deviation else {}),
+                **sort_key,
+            )
+            .transform_filter(
+                # count, set1, set2, ..., degree
+                # The "Other" bucket has no set membership but is still drawn.
+                (alt.datum["degree"] != 0) | (alt.datum["other"] == 1)
+                if has_other
+                else alt.datum["degree"] != 0
+            )
+            .transform_window(
+                # count, set1, set2, ..., degree
+                intersection_id="row_number()",
+                frame=[None, None],
+            )
+            .transform_fold(
+                # count, set1, set2, ..., degree, intersection_id
+                sets,
+                as_=["set", "is_intersect"],
+            )
+            .transform_lookup(
+                # count, set, is_intersect, degree, intersection_id
+                lookup="set",
+                from_=alt.LookupData(
+                    datasets.add(set_to_abbre), "set", ["set_abbre", "set_size"]
+                ),
+            )
+            .transform_lookup(
+                # count, set, is_intersect, degree, intersection_id, set_abbre
+                lookup="set",
+                from_=alt.LookupData(datasets.add(set_to_order), "set", ["set_order"]),
+            )
+            .transform_filter(
+                # Make sure to remove the filtered sets.
+                legend_selection
+            )
+            .transform_window(
+                # count, set, is_intersect, degree, intersection_id, set_abbre
+                set_order="distinct(set)",
+                frame=[None, 0],
+                sort=[{"field": "set_order"}],
+            )
         )
-    )
+        set_base = alt.Chart()
+    base = alt.Chart()
+
     # Now, we have data in the following format:
     # count, set, is_intersect, degree, intersection_id, set_abbre
 
@@ -256,13 +534,19 @@ def UpSetAltair(
         .properties(width=matrix_width, height=vertical_bar_chart_height)
     )
 
-    vertical_bar_text = vertical_bar.mark_text(
-        color=main_color, dy=-10, size=vertical_bar_label_size
-    ).encode(text=alt.Text("count:Q", format=".0f"))
-
-    vertical_bar_chart = (vertical_bar + vertical_bar_text).add_selection(
-        color_selection
+    # Bars and labels only need one row per intersection.
+    intersection_bar = (
+        vertical_bar
+        if precomputed
+        # Sets are renumbered after the legend filter, so the first visible set is 1.
+        else vertical_bar.transform_filter(alt.FieldEqualPredicate(field="set_order", equal=1))
     )
+    vertical_bar_chart = (
+        intersection_bar
+        + intersection_bar.mark_text(
+            color=main_color, dy=-10, size=vertical_bar_label_size
+        ).encode(text=alt.Text("count:Q", format=".0f"))
+    ).add_selection(color_selection)
 
     # UpSet glyph view (matrix view)
     circle_bg = (
@@ -284,31 +568,46 @@ def UpSetAltair(
         .properties(height=matrix_height)
     )
 
+    # Filters on fields are written as predicates rather than expressions, so that
+    # `profile_spec` can tell the layers apart.
     rect_bg = (
         circle_bg.mark_rect()
-        .transform_filter(alt.datum["set_order"] % 2 == 1)
+        .transform_filter(
+            alt.FieldOneOfPredicate(field="set_order", oneOf=list(range(1, len(sets) + 1, 2)))
+        )
         .encode(color=alt.value("#F7F7F7"))
     )
 
-    circle = circle_bg.transform_filter(alt.datum["is_intersect"] == 1).encode(
+    is_intersect = alt.FieldEqualPredicate(field="is_intersect", equal=1)
+    circle = circle_bg.transform_filter(is_intersect).encode(
         color=brush_color
     )
 
     line_connection = (
         vertical_bar.mark_bar(size=line_connection_size, color=main_color)
-        .transform_filter(alt.datum["is_intersect"] == 1)
+        .transform_filter(is_intersect)
         .encode(y=alt.Y("min(set_order):N"), y2=alt.Y2("max(set_order):N"))
     )
 
-    matrix_view = (
-        circle + rect_bg + circle_bg + line_connection + circle
-    ).add_selection(
-        # Duplicate `circle` is to properly show tooltips.
-        color_selection
-    )
+    matrix_layers = [rect_bg, circle_bg, line_connection, circle]
+    if has_other:
+        # The "Other" bucket has an empty matrix column, which is labelled instead.
+        matrix_layers.append(
+            circle_bg.transform_filter(alt.FieldEqualPredicate(field="other", equal=1))
+            .mark_text(angle=270, size=vertical_bar_label_size)
+            .encode(
+                y=alt.value(matrix_height / 2),
+                text=alt.value("Other"),
+                color=alt.value(main_color),
+                tooltip=[alt.Tooltip("max(count):Q", title="Other intersections")],
+            )
+        )
+
+    # The mouseover selection listens to the whole view, so it can live on the bottom layer.
+    matrix_view = alt.layer(*matrix_layers).add_selection(color_selection)
 
     # Cardinality by sets (horizontal bar chart)
-    horizontal_bar_label_bg = base.mark_circle(size=set_label_bg_size).encode(
+    horizontal_bar_label_bg = set_base.mark_circle(size=set_label_bg_size).encode(
         y=alt.Y(
             "set_order:N",
             axis=alt.Axis(grid=False, labels=False, ticks=False, domain=False),
@@ -330,20 +629,51 @@ def UpSetAltair(
         else horizontal_bar_label
     )
 
-    horizontal_bar = (
-        horizontal_bar_label_bg.mark_bar(size=horizontal_bar_size)
-        .transform_filter(alt.datum["is_intersect"] == 1)
+    # Set sizes are looked up rather than summed, so they include the intersections
+    # left out by the filters.
+    horizontal_bar = horizontal_bar_label_bg.mark_bar(size=horizontal_bar_size).encode(
+        x=alt.X(
+            "set_size:Q" if precomputed else "max(set_size):Q",
+            axis=alt.Axis(grid=False, tickCount=3),
+            title="Set Size",
+        )
+    ).properties(width=horizontal_bar_chart_width)
+
+    # Deviation from the expected size (vertical bar chart)
+    deviation_chart = (
+        base.transform_aggregate(
+            # One row per intersection, keeping the fields sorted on.
+            count="max(count)",
+            degree="max(degree)",
+            deviation="max(deviation)",
+            **{field: f"max({field})" for field in sort_key},
+            groupby=["intersection_id"],
+        )
+        .mark_bar(size=vertical_bar_size)
         .encode(
             x=alt.X(
-                "sum(count):Q", axis=alt.Axis(grid=False, tickCount=3), title="Set Size"
-            )
+                "intersection_id:N",
+                axis=alt.Axis(grid=False, labels=False, ticks=False, domain=True),
+                sort=x_sort,
+                title=None,
+            ),
+            y=alt.Y(
+                "deviation:Q",
+                axis=alt.Axis(grid=False, tickCount=3, orient="right"),
+                title="Deviation",
+            ),
+            color=alt.condition(
+                alt.datum["deviation"] >= 0, alt.value("#55A8DB"), alt.value("#DF6234")
+            ),
+            tooltip=[alt.Tooltip("deviation:Q", title="Deviation", format="+.1f")],
         )
-        .properties(width=horizontal_bar_chart_width)
+        .properties(width=matrix_width, height=deviation_chart_height)
     )
 
     # Concat Plots
     upsetaltair = alt.vconcat(
         vertical_bar_chart,
+        *([deviation_chart] if deviation else []),
         alt.hconcat(
             matrix_view,
             horizontal_bar_axis,
@@ -351,9 +681,12 @@ def UpSetAltair(
             spacing=5,
         ).resolve_scale(y="shared"),
         spacing=20,
+        data=source,
+        transform=pipeline.transform,
     ).add_selection(legend_selection)
 
     # Apply top-level configuration
+    upsetaltair = datasets.attach(upsetaltair)
     upsetaltair = upsetaltair_top_level_configuration(
         upsetaltair, legend_orient="top", legend_symbol_size=set_label_bg_size / 2.0
     ).properties(
@@ -368,3 +701,158 @@ def UpSetAltair(
     )
 
     return upsetaltair
+
+
+def from_batches(batches, sets, n_jobs=1, executor="thread", weight=None, **kwargs):
+    """Generate an UpSet plot from an iterator of row batches.
+
+    Intersections are counted batch by batch and merged, so the rows never need to be held
+    in memory at once.
+
+    Parameters:
+        - batches (iterable): pandas DataFrames, Arrow record batches or lists of records.
+        - sets (list): List of set names of interest to show in the UpSet plots.
+        - n_jobs (int): Number of shards to count each batch in, as in `UpSetAltair`.
+        - executor (str or concurrent.futures.Executor): Executor for the shards.
+        - weight (str): Numeric column to sum instead of counting rows, as in `UpSetAltair`.
+        - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+    """
+    counts = count_intersections_chunked(
+        batches, sets, n_jobs=n_jobs, executor=executor, weight=weight, packed=True
+    )
+    return _upsetaltair_chart(counts, sets=sets, **kwargs)
+
+
+def from_csv(
+    path,
+    sets,
+    chunksize=1_000_000,
+    read_csv_kwargs=None,
+    n_jobs=1,
+    executor="thread",
+    weight=None,
+    cache=False,
+    **kwargs,
+):
+    """Generate an UpSet plot from a CSV file, reading it in chunks.
+
+    Only the `sets` (and `weight`) columns are parsed. Memory use depends on `chunksize` and on the number
+    of distinct intersections, not on the size of the file.
+
+    Parameters:
+        - path (str or file-like): CSV file to read, as accepted by `pandas.read_csv`.
+        - sets (list): List of set names of interest to show in the UpSet plots.
+        - chunksize (int): Number of rows to read and count at a time.
+        - read_csv_kwargs (dict): Extra arguments passed to `pandas.read_csv`.
+        - n_jobs, executor, weight: As in `from_batches`.
+        - cache (bool, CountCache or DiskCache): Reuse the counts of a file with the same
+            contents, read with the same arguments. Only paths to local files are cached.
+        - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+    """
+    read_csv_kwargs = read_csv_kwargs or {}
+    columns = input_columns(sets, weight)
+
+    def count():
+        reader = pd.read_csv(path, usecols=columns, chunksize=chunksize, **read_csv_kwargs)
+        with reader:
+            return count_intersections_chunked(
+                reader, sets, n_jobs=n_jobs, executor=executor, weight=weight, packed=True
+            )
+
+    cache = resolve_cache(cache)
+    if cache is None:
+        counts = count()
+    else:
+        key = file_fingerprint(
+            path, sets=list(sets), weight=weight, read_csv_kwargs=read_csv_kwargs
+        )
+        counts = cache.memoize(key, count)
+    return _upsetaltair_chart(counts, sets=sets, **kwargs)
+
+
+def from_matrix(
+    matrix, sets, chunksize=1_000_000, dtype=None, n_jobs=1, executor="thread", **kwargs
+):
+    """Generate an UpSet plot from a membership matrix, memory-mapped from disk.
+
+    The matrix is counted over windows of `chunksize` rows, so it never needs to fit in
+    memory and no DataFrame is built.
+
+    Parameters:
+        - matrix (str, os.PathLike or numpy.ndarray): Path to a `.npy` file, or to a raw
+            file of `dtype` values in row-major order, or a 2-D array such as a
+            `numpy.memmap`. Each row is an element and each column the 0/1 membership in
+            one set.
+        - sets (list): Names of the matrix columns, in order.
+        - chunksize (int): Number of rows to read and count at a time.
+        - dtype: Element type of a raw file without a `.npy` header.
+        - n_jobs, executor: As in `from_batches`.
+        - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+    """
+    matrix = open_matrix(matrix, len(sets), dtype)
+    counts = count_intersections_chunked(
+        matrix_batches(matrix, sets, chunksize),
+        sets,
+        n_jobs=n_jobs,
+        executor=executor,
+        packed=True,
+    )
+    return _upsetaltair_chart(counts, sets=sets, **kwargs)
+
+
+def from_sets(memberships, sets=None, **kwargs):
+    """Generate an UpSet plot from a mapping of set name to the elements it contains.
+
+    Parameters:
+        - memberships (dict): Mapping of set name to an iterable of element IDs,
+            e.g. `{"Alpha": ["S:N501Y", ...], "Beta": [...]}`.
+        - sets (list): Sets to show, in order. Defaults to every key of `memberships`.
+        - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+    """
+    if sets is None:
+        sets = list(memberships)
+    return _upsetaltair_chart(
+        count_set_memberships(memberships, sets, packed=True), sets=sets, **kwargs
+    )
+
+
+def from_sketches(sketches, sets=None, **kwargs):
+    """Generate an UpSet plot of estimated intersection sizes from one sketch per set.
+
+    Use this when sets are too large to list their elements. The tooltip shows the margin
+    of error of each estimate next to its cardinality.
+
+    Parameters:
+        - sketches (dict): Mapping of set name to a `SetSketch`, or to a list of sketches of
+            parts of the set (for instance read back with `SetSketch.from_bytes` from
+            worker jobs), which are merged.
+        - sets (list): Sets to show, in order. Defaults to every key of `sketches`.
+        - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+    """
+    if sets is None:
+        sets = list(sketches)
+    return _upsetaltair_chart(sketch_intersections(sketches, sets), sets=sets, **kwargs)
+
+
+def from_counts(counts, sets, count_col="count", **kwargs):
+    """Generate an UpSet plot from intersection counts computed upstream.
+
+    Nothing is counted again, so the input size is the number of intersections rather than
+    the number of elements.
+
+    Parameters:
+        - counts (pandas.DataFrame): One row per exclusive intersection, with the 0/1 `sets`
+            columns and a count column. Rows for the same intersection are summed.
+        - sets (list): List of set names of interest to show in the UpSet plots.
+        - count_col (str): Name of the column holding the intersection sizes.
+        - **kwargs: Styling parameters passed on as in `UpSetAltair`.
+    """
+    return _upsetaltair_chart(normalize_counts(counts, sets, count_col), sets=sets, **kwargs)
+
+
+UpSetAltair.from_batches = from_batches
+UpSetAltair.from_counts = from_counts
+UpSetAltair.from_csv = from_csv
+UpSetAltair.from_matrix = from_matrix
+UpSetAltair.from_sets = from_sets
+UpSetAltair.from_sketches = from_sketches
@@ -0,0 +1,261 @@
+"""Size and rendering cost report of UpSet plot specs."""
+import json
+import warnings
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+# Budgets past which `profile_spec` warns.
+MAX_SPEC_BYTES = 5_000_000
+MAX_DATASET_ROWS = 5_000
+MAX_MARKS = 50_000
+
+# Transform operators of Vega-Lite, to name the steps of each layer.
+TRANSFORM_OPS = (
+    "aggregate",
+    "bin",
+    "calculate",
+    "density",
+    "extent",
+    "filter",
+    "flatten",
+    "fold",
+    "impute",
+    "joinaggregate",
+    "loess",
+    "lookup",
+    "pivot",
+    "quantile",
+    "regression",
+    "sample",
+    "stack",
+    "timeUnit",
+    "window",
+)
+
+DatasetProfile = namedtuple("DatasetProfile", ["name", "rows", "bytes"])
+LayerProfile = namedtuple("LayerProfile", ["path", "mark", "dataset", "transforms", "marks"])
+SpecProfile = namedtuple("SpecProfile", ["bytes", "datasets", "layers", "marks", "warnings"])
+
+
+class SpecBudgetWarning(UserWarning):
+    """A chart spec is past one of the budgets of `profile_spec`.
+
+    Pipelines can turn these warnings into errors to gate reports:
+    `warnings.simplefilter("error", SpecBudgetWarning)`.
+    """
+
+
+def profile_spec(
+    chart, max_bytes=MAX_SPEC_BYTES, max_rows=MAX_DATASET_ROWS, max_marks=MAX_MARKS
+):
+    """Report the size of a chart spec and estimate how much work it is to render.
+
+    Mark counts are estimated from the intersection table of the chart: a
+    layer encoding intersections draws one mark per intersection, one
+    encoding sets one mark per set, and the matrix layers one mark per
+    cell (or per member cell, when filtered on `is_intersect`). Tables
+    referenced by URL are read when the URL is a local file.
+
+    Args:
+        chart (alt.TopLevelMixin, dict or str): Chart returned by `UpSetAltair`,
+            or its spec as a dict or JSON
+        max_bytes (int): Warn past this size of the JSON spec
+        max_rows (int): Warn past this number of rows in one table
+        max_marks (int): Warn past this total number of marks
+
+    Returns:
+        SpecProfile: `bytes` of the JSON spec, `datasets` (a `DatasetProfile`
+            per table), `layers` (a `LayerProfile` per unit view, with the
+            path of the view, its mark type, table, transform steps and
+            estimated marks), total estimated `marks` and budget `warnings`.
+            Unknown sizes are None.
+    """
+    if isinstance(chart, str):
+        spec = json.loads(chart)
+    elif isinstance(chart, dict):
+        spec = chart
+    else:
+        spec = chart.to_dict()
+
+    tables = {}
+    datasets = []
+    for name, values in spec.get("datasets", {}).items():
+        tables[name] = values
+        datasets.append(DatasetProfile(name, len(values), len(json.dumps(values))))
+
+    layers = []
+    stats = {}
+
+    def register(data, path):
+        name = _table_name(data, path)
+        if name not in tables:
+            tables[name] = _read_table(data)
+            datasets.append(_dataset_profile(name, data, tables[name]))
+        return name
+
+    def walk(node, path, data, transforms):
+        if "data" in node:
+            # Views with their own data do not inherit the transforms above them.
+            data, transforms = register(node["data"], path), []
+        for transform in node.get("transform", []):
+            if "data" in transform.get("from", {}):
+                register(transform["from"]["data"], path)
+        transforms = transforms + node.get("transform", [])
+        if "mark" in node:
+            mark = node["mark"]["type"] if isinstance(node["mark"], dict) else node["mark"]
+            if data not in stats:
+                stats[data] = _table_stats(tables.get(data))
+            marks = _estimate_marks(
+                node.get("encoding", {}), transforms, tables.get(data), stats[data]
+            )
+            layers.append(LayerProfile(path, mark, data, [_op(t) for t in transforms], marks))
+        for key in ("layer", "hconcat", "vconcat", "concat"):
+            for i, child in enumerate(node.get(key, [])):
+                walk(child, f"{path}.{key}[{i}]" if path else f"{key}[{i}]", data, transforms)
+        if "spec" in node:
+            walk(node["spec"], f"{path}.spec" if path else "spec", data, transforms)
+
+    walk(spec, "", None, [])
+
+    size = len(json.dumps(spec))
+    known = [layer.marks for layer in layers if layer.marks is not None]
+    marks = sum(known) if known else None
+    messages = []
+    if max_bytes is not None and size > max_bytes:
+        messages.append(f"The spec is {size:,} bytes, over the budget of {max_bytes:,}")
+    for dataset in datasets:
+        if max_rows is not None and dataset.rows is not None and dataset.rows > max_rows:
+            messages.append(
+                f"Table {dataset.name} has {dataset.rows:,} rows, over the budget of {max_rows:,}"
+            )
+    if max_marks is not None and marks is not None and marks > max_marks:
+        messages.append(f"About {marks:,} marks are drawn, over the budget of {max_marks:,}")
+    for message in messages:
+        warnings.warn(message, SpecBudgetWarning, stacklevel=2)
+    return SpecProfile(size, datasets, layers, marks, messages)
+
+
+def explain(chart, **budgets):
+    """Describe the size and rendering cost of a chart spec as text.
+
+    Args:
+        chart (alt.TopLevelMixin, dict or str): Chart returned by `UpSetAltair`,
+            or its spec as a dict or JSON
+        **budgets: `max_bytes`, `max_rows` and `max_marks` of `profile_spec`
+
+    Returns:
+        str: One line per table and per layer, followed by the totals and
+            any budget warnings
+    """
+    profile = profile_spec(chart, **budgets)
+    lines = [f"Spec: {profile.bytes:,} bytes of JSON", "Datasets:"]
+    for dataset in profile.datasets:
+        lines.append(
+            f"  {dataset.name}: {_format(dataset.rows)} rows, {_format(dataset.bytes)} bytes"
+        )
+    lines.append("Layers:")
+    for layer in profile.layers:
+        steps = " > ".join(layer.transforms) or "no transforms"
+        lines.append(
+            f"  {layer.path} {layer.mark}: ~{_format(layer.marks)} marks,"
+            f" {len(layer.transforms)} transforms ({steps})"
+        )
+    lines.append(f"Total: ~{_format(profile.marks)} marks in {len(profile.layers)} layers")
+    lines.extend(f"Warning: {message}" for message in profile.warnings)
+    return "\n".join(lines)
+
+
+def _format(value):
+    return "?" if value is None else f"{value:,}"
+
+
+def _op(transform):
+    return next((op for op in TRANSFORM_OPS if op in transform), next(iter(transform)))
+
+
+def _table_name(data, path):
+    if "name" in data:
+        return data["name"]
+    if "url" in data:
+        return data["url"]
+    return f"values at {path or 'top level'}"
+
+
+def _read_table(data):
+    """Return the records of inline data or of a local file, or None."""
+    if "values" in data:
+        return data["values"]
+    path = Path(data.get("url", ""))
+    if "url" not in data or not path.is_file():
+        return None
+    data_format = data.get("format", {})
+    if data_format.get("type", path.suffix.lstrip(".")) == "csv":
+        # Like Vega, only parse the listed fields.
+        parse = {c: float for c, kind in data_format.get("parse", {}).items() if kind == "number"}
+        return pd.read_csv(path, dtype=str).astype(parse).to_dict("records")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _dataset_profile(name, data, values):
+    if values is None:
+        return DatasetProfile(name, None, None)
+    if "url" in data:
+        return DatasetProfile(name, len(values), Path(data["url"]).stat().st_size)
+    return DatasetProfile(name, len(values), len(json.dumps(values)))
+
+
+def _table_stats(values):
+    """Count the drawn intersections, sets and member cells of a table."""
+    if not values:
+        return None
+    frame = pd.DataFrame(values)
+    other = frame["other"] == 1 if "other" in frame else False
+    if "members" in frame:
+        members = frame["members"].astype(str)
+        drawn = members.str.contains("1") | other
+        return drawn.sum(), members.str.len().max(), members[drawn].str.count("1").sum()
+    if "is_intersect" in frame:
+        if "degree" in frame:
+            frame = frame[(frame["degree"] != 0) | other]
+        return (
+            frame["intersection_id"].nunique(),
+            frame["set"].nunique(),
+            int((frame["is_intersect"] == 1).sum()),
+        )
+    return None
+
+
+def _estimate_marks(encoding, transforms, values, stats):
+    if values is None:
+        return None
+    fields = {
+        encoding[channel]["field"]
+        for channel in ("x", "y")
+        if isinstance(encoding.get(channel), dict)
+        and "field" in encoding[channel]
+        and "aggregate" not in encoding[channel]
+    }
+    if stats is None or not fields & {"intersection_id", "set_order"}:
+        return len(values) if fields else 1
+    intersections, sets, members = (int(n) for n in stats)
+    if "intersection_id" not in fields:
+        return sets
+    # Field predicates of the filters, by field.
+    predicates = {
+        t["filter"]["field"]: t["filter"]
+        for t in transforms
+        if isinstance(t.get("filter"), dict) and "field" in t["filter"]
+    }
+    if "set_order" not in fields:
+        # The label of the "Other" bucket is its only intersection.
+        return 1 if predicates.get("other", {}).get("equal") == 1 else intersections
+    if predicates.get("is_intersect", {}).get("equal") == 1:
+        return members
+    if "oneOf" in predicates.get("set_order", {}):
+        # Background stripes on every other set.
+        drawn = [order for order in predicates["set_order"]["oneOf"] if 1 <= order <= sets]
+        return intersections * len(drawn)
+    return intersections * sets
@@ -0,0 +1,155 @@
+"""Approximate intersection sizes from mergeable set sketches."""
+import numpy as np
+import pandas as pd
+
+from .aggregation import count_intersections
+
+# Elements are hashed and deduplicated this many at a time.
+SKETCH_CHUNK_ROWS = 1 << 20
+
+# Normal quantile of the intervals reported in the `error` column.
+ERROR_Z = 1.96
+
+
+class SetSketch:
+    """Bottom-k (KMV) sketch of the distinct elements of one set.
+
+    The sketch keeps the `k` smallest 64-bit hashes of the elements, which
+    are a uniform sample of them. Sketches of parts of the same set, for
+    instance built by separate worker jobs, merge into the sketch of the
+    whole set, and the sketches of several sets together give a sample of
+    their union in which the membership of every element is known.
+
+    Elements are hashed with `pandas.util.hash_array`, which gives the same
+    hashes in every process. The same ID must have the same type everywhere
+    (an int and its string form hash differently).
+
+    Parameters:
+        - k (int): Number of hashes kept. The relative error of estimates is
+            about 1 / sqrt(k).
+        - elements (iterable): Optional initial elements.
+
+    Example:
+        part = SetSketch(k=4096, elements=ids).to_bytes()  # in a worker
+        sketch = SetSketch.from_bytes(part).merge(SetSketch.from_bytes(other_part))
+    """
+
+    def __init__(self, k=4096, elements=None):
+        if k < 2:
+            raise ValueError("k must be at least 2")
+        self.k = k
+        self.hashes = np.empty(0, dtype=np.uint64)
+        if elements is not None:
+            self.update(elements)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def update(self, elements):
+        """Add elements to the sketch.
+
+        Args:
+            elements (iterable): Element IDs
+
+        Returns:
+            SetSketch: The sketch itself, to allow chaining.
+        """
+        if not isinstance(elements, (np.ndarray, pd.Series, pd.Index, list, tuple)):
+            elements = list(elements)
+        elements = np.asarray(elements)
+        for start in range(0, len(elements), SKETCH_CHUNK_ROWS):
+            chunk = pd.util.hash_array(elements[start : start + SKETCH_CHUNK_ROWS])
+            if len(self.hashes) == self.k:
+                # Only hashes below the current k-th smallest can enter.
+                chunk = chunk[chunk < self.hashes[-1]]
+            self.hashes = self._smallest(np.concatenate([self.hashes, chunk]))
+        return self
+
+    def merge(self, *others):
+        """Return the sketch of the union of this sketch's elements and others'.
+
+        Sketches with different `k` merge into a sketch of the smallest `k`.
+        """
+        k = min([self.k] + [other.k for other in others])
+        merged = SetSketch(k)
+        merged.hashes = merged._smallest(
+            np.concatenate([self.hashes] + [other.hashes for other in others])
+        )
+        return merged
+
+    def estimate(self):
+        """Estimate the number of distinct elements.
+
+        Returns:
+            float: The exact count if fewer than `k` elements were added,
+                otherwise the KMV estimate (k - 1) / (k-th smallest hash,
+                scaled to [0, 1))
+        """
+        if len(self.hashes) < self.k:
+            return float(len(self.hashes))
+        return (self.k - 1) / ((float(self.hashes[-1]) + 1.0) / 2.0**64)
+
+    def to_bytes(self):
+        """Serialize the sketch: `k` followed by the hashes, as little-endian uint64."""
+        header = np.array([self.k], dtype=np.uint64)
+        return np.concatenate([header, self.hashes]).astype("<u8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Read a sketch written by `to_bytes`."""
+        values = np.frombuffer(data, dtype="<u8")
+        sketch = cls(int(values[0]))
+        sketch.hashes = values[1:].astype(np.uint64)
+        return sketch
+
+    def _smallest(self, hashes):
+        hashes = np.unique(hashes)
+        return hashes[: self.k]
+
+
+def sketch_intersections(sketches, sets=None):
+    """Estimate exclusive intersection sizes from one sketch per set.
+
+    The sketches are merged into a sketch of the union of the sets. Its
+    hashes are a uniform sample of the union, and each sampled element's
+    membership is read from the per-set sketches (an element of the union
+    sample that belongs to a set is always in that set's sketch). The
+    share of each intersection in the sample is scaled by the estimated
+    size of the union.
+
+    Args:
+        sketches (dict): Mapping of set name to a `SetSketch`, or to a list of
+            sketches of parts of the set, which are merged
+        sets (list): Sets to use, in order. Defaults to every key of `sketches`.
+
+    Returns:
+        pd.DataFrame: Set columns, the estimated `count` and `error`, the
+            half-width of an approximate 95% interval around it (0 when the
+            sets are small enough to be counted exactly)
+    """
+    if sets is None:
+        sets = list(sketches)
+    parts = {}
+    for s in sets:
+        sketch = sketches[s]
+        if isinstance(sketch, (list, tuple)):
+            sketch = sketch[0].merge(*sketch[1:])
+        parts[s] = sketch
+
+    union = next(iter(parts.values())).merge(*list(parts.values())[1:])
+    sample = {s: np.isin(union.hashes, parts[s].hashes).astype(np.uint8) for s in sets}
+    table = count_intersections(sample, sets)
+
+    n = len(union)
+    if n < union.k:
+        table["error"] = 0.0
+        return table
+
+    # The sampled share follows a binomial law, and the union estimate has
+    # a relative standard error of about 1 / sqrt(k - 2).
+    share = table["count"].to_numpy() / n
+    size = union.estimate()
+    variance = size**2 * (share * (1 - share) / n + share**2 / (n - 2))
+    table["count"] = np.round(share * size).astype(np.int64)
+    table["error"] = ERROR_Z * np.sqrt(variance)
+    return table
@@ -1,8 +1,20 @@
 """Data transformation functions for UpSet plots."""
+import json
+
+import numpy as np
 import pandas as pd
+from .aggregation import (
+    PACKED_KEY,
+    count_intersections,
+    is_binary_membership,
+    membership_matrix,
+    packed_degree,
+)
 
 
-def preprocess_data(data, sets, abbre, sort_by, sort_order):
+def preprocess_data(
+    data, sets, abbre, sort_by, sort_order, n_jobs=1, executor="thread", weight=None
+):
     """Preprocess the input data for the UpSet plot.
     
     Args:
@@ -11,23 +23,17 @@ def preprocess_data(data, sets, abbre, sort_by, sort_order):
         abbre (list): List of abbreviated set names
         sort_by (str): Sort method ('frequency' or 'degree')
         sort_order (str): Sort order ('ascending' or 'descending')
+        n_jobs (int): Number of row shards to count in parallel
+        executor (str or Executor): 'thread', 'process' or an Executor
+        weight (str): Numeric column summed per intersection instead of counting rows
     
     Returns:
         dict: Processed data and abbreviations
     """
-    data = data.copy()
-    data["count"] = 0
-    data = data[sets + ["count"]]
-    data = data.groupby(sets).count().reset_index()
-
-    data["intersection_id"] = data.index
-    data["degree"] = data[sets].sum(axis=1)
-    data = data.sort_values(
-        by=["count"], ascending=True if sort_order == "ascending" else False
+    data = count_intersections(
+        data, sets, n_jobs=n_jobs, executor=executor, weight=weight
     )
-
-    data = pd.melt(data, id_vars=["intersection_id", "count", "degree"])
-    data = data.rename(columns={"variable": "set", "value": "is_intersect"})
+    data = melt_counts(data, sets, sort_order)
 
     if abbre is None:
         abbre = sets
@@ -41,6 +47,263 @@ def preprocess_data(data, sets, abbre, sort_by, sort_order):
     return {"data": data, "abbre": abbre}
 
 
+def melt_counts(data, sets, sort_order):
+    """Reshape an intersection count table into one row per intersection and set.
+
+    Membership is stored as uint8, set names as a categorical and the ids,
+    counts and degrees in the smallest integer type that holds them.
+
+    Args:
+        data (pd.DataFrame): Set columns and a `count` column. Any other
+            column is repeated on every row of its intersection.
+        sets (list): List of set names
+        sort_order (str): Sort order of the counts ('ascending' or 'descending')
+
+    Returns:
+        pd.DataFrame: `intersection_id`, `count`, `degree`, `set` and
+            `is_intersect` columns
+    """
+    extra = [c for c in data.columns if c not in sets and c != "count"]
+    data = data[sets + ["count"] + extra].assign(intersection_id=data.index)
+    data["degree"] = data[sets].sum(axis=1)
+    data = data.sort_values(
+        by=["count"], ascending=True if sort_order == "ascending" else False
+    )
+
+    if is_binary_membership(data, sets):
+        data[sets] = data[sets].astype(np.uint8)
+    for column in ["intersection_id", "count", "degree"] + extra:
+        data[column] = compact_int(data[column])
+
+    data = pd.melt(
+        data, id_vars=["intersection_id", "count", "degree"] + extra, value_vars=sets
+    )
+    data = data.rename(columns={"variable": "set", "value": "is_intersect"})
+    data["set"] = pd.Categorical(data["set"], categories=list(dict.fromkeys(sets)))
+    return data
+
+
+def compact_counts(data, sets):
+    """Encode an intersection count table as one compact row per intersection.
+
+    The sets of each intersection are written as a `members` string of one
+    "0" or "1" per set, in the order of `sets`, which
+    `create_membership_calculation` reads back in Vega-Lite. A row then
+    costs a few bytes per set in the spec instead of a record per set.
+
+    Args:
+        data (pd.DataFrame): Set columns and a `count` column. Any other
+            column is kept as is.
+        sets (list): List of set names
+
+    Returns:
+        pd.DataFrame: `members` and `count` columns, followed by the other columns
+    """
+    members = np.ascontiguousarray(data[sets].to_numpy() != 0, dtype=np.uint8) + ord("0")
+    extra = [c for c in data.columns if c not in sets and c != "count"]
+    compact = pd.DataFrame(
+        {"members": members.view(f"S{len(sets)}").ravel().astype(str)}, index=data.index
+    )
+    for column in ["count"] + extra:
+        compact[column] = compact_int(data[column])
+    return compact.reset_index(drop=True)
+
+
+def filter_intersections(
+    data,
+    sets,
+    top_k=None,
+    min_size=None,
+    min_degree=None,
+    max_degree=None,
+    other=False,
+):
+    """Keep only the intersections that will be drawn.
+
+    When any filter is given, the empty intersection (degree 0) is dropped as
+    well, since the charts never draw it. `top_k` uses a partial selection
+    instead of sorting every intersection.
+
+    Args:
+        data (pd.DataFrame): Set columns (or a packed key column, see
+            `aggregation.packed_count_table`) and a `count` column
+        sets (list): List of set names
+        top_k (int): Keep the `top_k` largest intersections
+        min_size (number): Keep intersections with at least this count
+        min_degree (int): Keep intersections of at least this many sets
+        max_degree (int): Keep intersections of at most this many sets
+        other (bool): Add one intersection with no set membership holding the
+            totals of the `count` (and any other value) column over the
+            dropped intersections, flagged by an `other` column
+
+    Returns:
+        pd.DataFrame: The kept intersections, in their original order
+    """
+    if top_k is None and min_size is None and min_degree is None and max_degree is None:
+        return data
+
+    counts = data["count"].to_numpy()
+    if PACKED_KEY in data.columns:
+        degree = packed_degree(data[PACKED_KEY])
+    else:
+        degree = (data[sets] != 0).sum(axis=1).to_numpy()
+    keep = degree > 0
+    if min_size is not None:
+        keep &= counts >= min_size
+    if min_degree is not None:
+        keep &= degree >= min_degree
+    if max_degree is not None:
+        keep &= degree <= max_degree
+    if top_k is not None:
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > top_k:
+            keep[:] = False
+            if top_k > 0:
+                largest = np.argpartition(counts[candidates], len(candidates) - top_k)
+                keep[candidates[largest[-top_k:]]] = True
+
+    kept = data[keep]
+    dropped = (degree > 0) & ~keep
+    if other and dropped.any():
+        if PACKED_KEY in data.columns:
+            bucket = pd.DataFrame({PACKED_KEY: [bytes((len(sets) + 7) // 8)]})
+        else:
+            bucket = pd.DataFrame({s: np.zeros(1, dtype=data[s].dtype) for s in sets})
+        for column in data.columns.drop(bucket.columns):
+            bucket[column] = data[column].to_numpy()[dropped].sum()
+        kept = pd.concat([kept.assign(other=0), bucket.assign(other=1)])
+    return kept.reset_index(drop=True)
+
+
+def set_sizes(data, sets):
+    """Sum the `count` column over the intersections of each set.
+
+    Called on the complete table, before `filter_intersections`, this gives
+    the size of each set whatever intersections are drawn.
+
+    Args:
+        data (pd.DataFrame): Exclusive intersection table, with set columns
+            (or a packed key column) and a `count` column
+        sets (list): List of set names
+
+    Returns:
+        np.ndarray: Size per set
+    """
+    counts = data["count"].to_numpy()
+    counts = counts.astype(np.float64 if counts.dtype.kind == "f" else np.int64)
+    return counts @ membership_matrix(data, sets)
+
+
+def expected_sizes(data, sets):
+    """Compute the expected size of each intersection if the sets were independent.
+
+    Set `i` holds a share `p_i` of all the elements counted in the table
+    (including those in no set). The expected size of an intersection is
+    that total times the product of `p_i` over its sets and of `1 - p_i`
+    over the other sets, as for the deviation bars of the original UpSet
+    paper. The product is accumulated in log space, one vectorized pass
+    per set.
+
+    Args:
+        data (pd.DataFrame): Exclusive intersection table, with set columns
+            (or a packed key column) and a `count` column
+        sets (list): List of set names
+
+    Returns:
+        np.ndarray: Expected size per intersection
+    """
+    counts = data["count"].to_numpy(dtype=np.float64)
+    total = counts.sum()
+    if total <= 0:
+        return np.zeros(len(data))
+
+    members = membership_matrix(data, sets)
+    log_expected = np.full(len(data), np.log(total))
+    with np.errstate(divide="ignore"):
+        for i in range(len(sets)):
+            share = counts[members[:, i]].sum() / total
+            log_expected += np.where(members[:, i], np.log(share), np.log1p(-share))
+    return np.exp(log_expected)
+
+
+def layout_counts(data, sets, abbre, sort_by, sort_order, inclusive=False, sizes=None):
+    """Lay out the drawn intersections in the long form the charts encode.
+
+    This does in pandas what the Vega transforms of the default layout do
+    in the browser: the empty intersection is dropped (unless it is the
+    "Other" bucket, which is ranked last), intersections are ranked by
+    `sort_by`, and every (intersection, set) cell gets its set abbreviation
+    and order. Set sizes are summed over the drawn intersections unless
+    `sizes` is given.
+
+    Args:
+        data (pd.DataFrame): Set columns, a `count` column and any other
+            value column, one row per intersection
+        sets (list): List of set names
+        abbre (list): List of abbreviated set names
+        sort_by (str): Sort method ('frequency' or 'degree')
+        sort_order (str): Sort order ('ascending' or 'descending')
+        inclusive (bool): Whether the counts are inclusive, in which case set
+            sizes are those of the single-set combinations
+        sizes (np.ndarray): Size per set, from `set_sizes` on the unfiltered
+            table
+
+    Returns:
+        tuple: (cells DataFrame with `intersection_id` as the rank of each
+            intersection, `count`, `degree`, `set`, `is_intersect`,
+            `set_abbre` and `set_order` columns, sets DataFrame with `set`,
+            `set_abbre`, `set_order` and `set_size` columns)
+    """
+    members = data[sets].to_numpy() != 0
+    degree = members.sum(axis=1)
+    keep = degree > 0
+    if "other" in data.columns:
+        keep |= data["other"].to_numpy() == 1
+    data, members, degree = data[keep], members[keep], degree[keep]
+
+    counts = data["count"].to_numpy()
+    if sizes is None:
+        sized = members & (degree == 1)[:, None] if inclusive else members
+        sizes = (counts[:, None] * sized).sum(axis=0)
+    set_data = pd.DataFrame(
+        {
+            "set": sets,
+            "set_abbre": abbre,
+            "set_order": np.arange(1, len(sets) + 1),
+            "set_size": sizes,
+        }
+    )
+
+    order = np.argsort(counts if sort_by == "frequency" else degree, kind="stable")
+    if sort_order != "ascending":
+        order = order[::-1]
+    if "other" in data.columns:
+        # The "Other" bucket is not an intersection; it goes last either way.
+        order = order[np.argsort(data["other"].to_numpy()[order], kind="stable")]
+    cells = melt_counts(data.iloc[order].reset_index(drop=True), sets, sort_order)
+    codes = cells["set"].cat.codes.to_numpy()
+    cells["set_abbre"] = pd.Categorical(np.asarray(abbre, dtype=object)[codes])
+    cells["set_order"] = compact_int(pd.Series(codes + 1, index=cells.index))
+    return cells, set_data
+
+
+def compact_int(values):
+    """Downcast an integer column to the smallest type that holds its values.
+
+    Args:
+        values (pd.Series): Column to downcast
+
+    Returns:
+        pd.Series: The downcast column, or `values` itself if it is not an
+            integer column
+    """
+    if values.dtype.kind not in "iu" or len(values) == 0:
+        return values
+    return pd.to_numeric(
+        values, downcast="unsigned" if values.min() >= 0 else "integer"
+    )
+
+
 def create_degree_calculation(sets):
     """Create the degree calculation formula for Vega-Lite.
     
@@ -53,6 +316,30 @@ def create_degree_calculation(sets):
     return "+".join([f"(isDefined(datum['{s}']) ? datum['{s}'] : 0)" for s in sets])
 
 
+def create_membership_calculation(sets, selection_name):
+    """Create the Vega-Lite expressions reading set columns back from `members`.
+
+    A set is 0 while it is hidden by the legend selection, so that the
+    intersections that only differ by hidden sets can be merged.
+
+    Args:
+        sets (list): List of set names, in the order of the `members` strings
+        selection_name (str): Name of the legend selection on the `set` field
+
+    Returns:
+        dict: Vega-Lite expression per set name
+    """
+    store = json.dumps(f"{selection_name}_store")
+    return {
+        s: (
+            f"substring(datum['members'], {i}, {i + 1}) === '1'"
+            f" && (!length(data({store})) || vlSelectionTest({store}, {{set: {json.dumps(s)}}}))"
+            " ? 1 : 0"
+        )
+        for i, s in enumerate(sets)
+    }
+
+
 def create_set_mappings(sets, abbre):
     """Create mappings for set abbreviations and orders.
     
@@ -1,5 +1,6 @@
 import altair as alt
 import pandas as pd
+from altair_upset.aggregation import count_intersections
 
 def visualize(
     data=None,
@@ -63,9 +64,7 @@ def visualize(
     """
     Data Preprocessing
     """
-    data["count"] = 0
-    data = data[sets + ["count"]]
-    data = data.groupby(sets).count().reset_index()
+    data = count_intersections(data, sets)
 
     data["intersection_id"] = data.index
     data["degree"] = data[sets].sum(axis=1)
@@ -353,7 +352,7 @@ if __name__ == '__main__':
     df = pd.read_csv("https://ndownloader.figshare.com/files/22339791")
 
     upset_altair = visualize(
-        data=df.copy(),
+        data=df,
         title="Symptoms Reported by Users of the COVID Symptom Tracker App",
         subtitle=[
             "Story & Data: https://www.nature.com/articles/d41586-020-00154-w",
@@ -56,35 +56,26 @@ def _(json, json_str, pd, urlopen):
 
     unique_vars, json_data, unique_mutations
 
-    # Generate data for UpSet
-    data = {}
-    for i, m in enumerate(unique_mutations):
-        for v in unique_vars:
-            if i == 0:
-                data[v] = []
-            data[v].append(1 if m in json_data[v] else 0)
-
-    df = pd.DataFrame(data)
-
-    # Rename columns to match variant names
-    df = df.set_axis(
-        [
-            "Alpha",
-            "Beta",
-            "Gamma",
-            "Delta",
-            "Kappa",
-            "Omicron",
-            "Eta",
-            "Iota",
-            "Lambda",
-            "Mu",
-            "-",
-        ],
-        axis=1,
-    )
-    df = df.drop("-", axis=1)
-    df  # Create sample COVID variant data with more realistic intersections
+    # Map variant names to their mutations; `UpSetAltair.from_sets` counts
+    # the intersections without building a mutation-by-variant table.
+    variant_names = [
+        "Alpha",
+        "Beta",
+        "Gamma",
+        "Delta",
+        "Kappa",
+        "Omicron",
+        "Eta",
+        "Iota",
+        "Lambda",
+        "Mu",
+        "-",
+    ]
+    memberships = {
+        name: json_data[v] for name, v in zip(variant_names, unique_vars) if name != "-"
+    }
+
+    # Create sample COVID variant data with more realistic intersections
     df = pd.DataFrame(
         {
             "Alpha": [1, 1, 1, 0, 1, 0, 1, 0],  # 5 occurrences
@@ -96,17 +87,15 @@ def _(json, json_str, pd, urlopen):
     )
     return (
         content,
-        data,
         df,
-        i,
         json_data,
-        m,
+        memberships,
         mutations,
         name,
         res,
         unique_mutations,
         unique_vars,
-        v,
+        variant_names,
     )
 
 
@@ -139,8 +128,8 @@ app._unparsable_cell(
             \"#85b6b2\",
             \"#6a9f58\",
         ],  # Color-blind friendly palette
-    )chart = UpSetAltair(
-        data=df.copy(),
+    )chart = UpSetAltair.from_sets(
+        memberships,
         title=\"Shared Mutations of COVID Variants\",
         subtitle=[
             \"Story & Data: https://covariants.org/shared-mutations\",
@@ -191,7 +180,7 @@ def _(chart, mo):
 def _(UpSetAltair, df, mo):
     mo.ui.altair_chart(
         UpSetAltair(
-            data=df.copy(),
+            data=df,
             title="Shared Mutations of COVID Variants",
             subtitle=[
                 "Story & Data: https://covariants.org/shared-mutations",
@@ -86,7 +86,7 @@ def _():
 def _(UpSetAltair, df, mo):
     mo.ui.altair_chart(
         UpSetAltair(
-            data=df.copy(),
+            data=df,
             title="Symptoms Reported by Users of the COVID Symptom Tracker App",
             subtitle=[
                 "Story and Data: https://www.nature.com/articles/d41586-020-00154-w",
@@ -112,7 +112,7 @@ def _(UpSetAltair, df, mo):
 def _(UpSetAltair, df, mo):
     mo.ui.altair_chart(
         UpSetAltair(
-            data=df.copy(),
+            data=df,
             title="Symptoms Reported by Users of the COVID Symptom Tracker App",
             subtitle=[
                 "Story & Data: https://www.nature.com/articles/d41586-020-00154-w",
@@ -138,7 +138,7 @@ def _(UpSetAltair, df, mo):
 def _(UpSetAltair, df, mo):
     mo.ui.altair_chart(
         UpSetAltair(
-            data=df.copy(),
+            data=df,
             title="Symptoms Reported by Users of the COVID Symptom Tracker App",
             subtitle=[
                 "Story and Data: https://www.nature.com/articles/d41586-020-00154-w",
@@ -27,11 +27,15 @@ def visualize_upset(data, sets, title="UpSet Plot", **kwargs):
         sets: list of set names
         title: str, plot title
         **kwargs: additional parameters for UpSetAltair
+
+    The intersection counts are cached, so calling this again on the same
+    data with other styling parameters does not count the rows again.
     """
     plot = UpSetAltair(
         data=data,
         sets=sets,
         title=title,
+        cache=True,
         **kwargs
     )
     return plot
@@ -0,0 +1,244 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+from altair_upset import UpSetAltair, aggregation
+from altair_upset.aggregation import (
+    PACKED_KEY,
+    count_intersections,
+    count_intersections_chunked,
+    count_set_memberships,
+    decode_keys,
+    encode_keys,
+    groupby_count,
+    inclusive_counts,
+    merge_counts,
+    normalize_counts,
+)
+
+
+def random_membership(n_rows=1000, n_sets=6, seed=0):
+    """Create random 0/1 membership data"""
+    rng = np.random.default_rng(seed)
+    sets = [f"set{i}" for i in range(n_sets)]
+    return pd.DataFrame(rng.integers(0, 2, (n_rows, n_sets)), columns=sets), sets
+
+
+def test_matches_groupby(sample_data):
+    """Test that key counting reproduces the groupby table"""
+    sets = ["set1", "set2", "set3"]
+    tm.assert_frame_equal(
+        count_intersections(sample_data, sets), groupby_count(sample_data, sets)
+    )
+
+
+def test_matches_groupby_random():
+    """Test key counting on larger random data, with and without bincount"""
+    for n_sets in [3, 12, 24]:
+        data, sets = random_membership(n_rows=5000, n_sets=n_sets, seed=n_sets)
+        tm.assert_frame_equal(
+            count_intersections(data, sets), groupby_count(data, sets)
+        )
+
+
+def test_boolean_columns():
+    """Test that boolean membership keeps its dtype"""
+    data, sets = random_membership()
+    data = data.astype(bool)
+    tm.assert_frame_equal(count_intersections(data, sets), groupby_count(data, sets))
+
+
+def test_non_binary_fallback():
+    """Test that non-binary or missing values fall back to the groupby"""
+    data = pd.DataFrame({"a": [0, 2, 2, 1], "b": [1.0, np.nan, 0.0, 1.0]})
+    tm.assert_frame_equal(
+        count_intersections(data, ["a", "b"]), groupby_count(data, ["a", "b"])
+    )
+
+
+def test_key_roundtrip():
+    """Test that decoding the keys restores the membership columns"""
+    data, sets = random_membership(n_rows=50)
+    decoded = decode_keys(encode_keys(data, sets), sets)
+    tm.assert_frame_equal(decoded, data.astype(np.int64))
+
+
+def test_does_not_mutate_input(sample_data):
+    """Test that counting does not add columns to the input"""
+    columns = list(sample_data.columns)
+    count_intersections(sample_data, ["set1", "set2"])
+    assert list(sample_data.columns) == columns
+
+
+def test_chunked_matches_full():
+    """Test that merging per-chunk counts matches counting all rows at once"""
+    data, sets = random_membership(n_rows=2000, n_sets=8)
+    chunks = (data.iloc[i : i + 300] for i in range(0, len(data), 300))
+    tm.assert_frame_equal(
+        count_intersections_chunked(chunks, sets), count_intersections(data, sets)
+    )
+
+
+def test_chunked_records():
+    """Test counting batches given as lists of records"""
+    data, sets = random_membership(n_rows=100, n_sets=3)
+    records = data.to_dict("records")
+    batches = [records[:40], records[40:]]
+    tm.assert_frame_equal(
+        count_intersections_chunked(batches, sets), count_intersections(data, sets)
+    )
+
+
+def test_merge_non_binary():
+    """Test merging tables that fall back to the groupby"""
+    data = pd.DataFrame({"a": [0, 2, 2, 1], "b": [1, 0, 0, 1]})
+    merged = merge_counts(
+        [count_intersections(data, ["a", "b"]), count_intersections(data, ["a", "b"])],
+        ["a", "b"],
+    )
+    expected = count_intersections(data, ["a", "b"])
+    expected["count"] *= 2
+    tm.assert_frame_equal(merged, expected)
+
+
+def test_parallel_matches_serial(monkeypatch):
+    """Test that counting shards on threads or processes matches the serial path"""
+    monkeypatch.setattr(aggregation, "MIN_SHARD_ROWS", 100)
+    data, sets = random_membership(n_rows=1000, n_sets=10)
+    expected = count_intersections(data, sets)
+    for executor in ["thread", "process"]:
+        tm.assert_frame_equal(
+            count_intersections(data, sets, n_jobs=4, executor=executor), expected
+        )
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        tm.assert_frame_equal(
+            count_intersections(data, sets, n_jobs=-1, executor=pool), expected
+        )
+
+
+def test_parallel_validation(monkeypatch):
+    """Test the n_jobs and executor checks"""
+    monkeypatch.setattr(aggregation, "MIN_SHARD_ROWS", 100)
+    data, sets = random_membership(n_rows=1000)
+    with pytest.raises(ValueError, match="n_jobs"):
+        count_intersections(data, sets, n_jobs=0)
+    with pytest.raises(ValueError, match="executor"):
+        count_intersections(data, sets, n_jobs=2, executor="gpu")
+
+
+def test_set_memberships_match_dense_frame():
+    """Test counting from a set-to-elements mapping against the dense 0/1 frame"""
+    memberships = {
+        "Alpha": ["m1", "m2", "m3", "m5"],
+        "Beta": {"m2", "m3", "m4"},
+        "Gamma": np.array(["m3", "m4", "m6", "m6"]),
+    }
+    elements = sorted(set().union(*map(set, memberships.values())))
+    dense = pd.DataFrame(
+        {s: [int(e in set(ids)) for e in elements] for s, ids in memberships.items()}
+    )
+    sets = ["Gamma", "Alpha", "Beta"]
+    tm.assert_frame_equal(
+        count_set_memberships(memberships, sets), count_intersections(dense, sets)
+    )
+
+
+
+def test_set_memberships_beyond_key_sets():
+    """Test counting a mapping of more than 64 sets on byte keys"""
+    rng = np.random.default_rng(9)
+    sets = [f"gene_set_{i}" for i in range(70)]
+    dense = pd.DataFrame((rng.random((300, 70)) < 0.05).astype(np.int64), columns=sets)
+    memberships = {s: np.flatnonzero(dense[s]) for s in sets}
+    table = count_set_memberships(memberships, sets)
+    expected = count_intersections(dense, sets)
+    # Elements in no set are not listed in a mapping.
+    expected = expected[expected[sets].any(axis=1)].reset_index(drop=True)
+    tm.assert_frame_equal(table, expected)
+
+    packed = count_set_memberships(memberships, sets, packed=True)
+    assert packed.columns.tolist() == [PACKED_KEY, "count"]
+    chart = UpSetAltair.from_sets(memberships, sets, top_k=10).to_dict()
+    values = next(iter(chart["datasets"].values()))
+    assert len(values) == 10 * len(sets)
+
+def test_normalize_counts():
+    """Test that duplicate intersections are summed and negative counts rejected"""
+    counts = pd.DataFrame({"a": [1, 0, 1], "b": [1, 1, 1], "n": [2, 3, 4]})
+    table = normalize_counts(counts, ["a", "b"], "n")
+    assert table.values.tolist() == [[0, 1, 3], [1, 1, 6]]
+    with pytest.raises(ValueError, match="negative"):
+        normalize_counts(counts.assign(n=-1), ["a", "b"], "n")
+
+
+def test_weighted_counts(monkeypatch):
+    """Test that weights are summed per intersection on every counting path"""
+    monkeypatch.setattr(aggregation, "MIN_SHARD_ROWS", 100)
+    data, sets = random_membership(n_rows=1000, n_sets=5)
+    data["reads"] = np.arange(len(data))
+    data.loc[3, "reads"] = 7
+    expected = data.groupby(sets)["reads"].sum().reset_index(name="count")
+
+    tm.assert_frame_equal(count_intersections(data, sets, weight="reads"), expected)
+    tm.assert_frame_equal(
+        count_intersections(data, sets, n_jobs=3, weight="reads"), expected
+    )
+    chunks = (data.iloc[i : i + 128] for i in range(0, len(data), 128))
+    tm.assert_frame_equal(
+        count_intersections_chunked(chunks, sets, weight="reads"), expected
+    )
+    non_binary = data.assign(set0=data["set0"] * 2)
+    tm.assert_frame_equal(
+        count_intersections(non_binary, sets, weight="reads"),
+        non_binary.groupby(sets)["reads"].sum().reset_index(name="count"),
+    )
+
+
+def test_weight_must_be_numeric(sample_data):
+    """Test that a non-numeric weight column is rejected"""
+    with pytest.raises(TypeError, match="numeric"):
+        count_intersections(sample_data.assign(w="x"), ["set1"], weight="w")
+
+
+def test_inclusive_counts():
+    """Test that inclusive sizes count every row in all the combined sets"""
+    data, sets = random_membership(n_rows=500, n_sets=5)
+    data["reads"] = np.arange(len(data)) % 7
+    table = inclusive_counts(count_intersections(data, sets, weight="reads"), sets)
+    assert len(table) == 2 ** len(sets)
+    for _, row in table.iterrows():
+        rows = (data[sets] >= row[sets]).all(axis=1)
+        assert row["count"] == data.loc[rows, "reads"].sum()
+
+    with pytest.raises(ValueError):
+        inclusive_counts(groupby_count(data.assign(set0=2), sets), sets)
+    many = [f"s{i}" for i in range(aggregation.INCLUSIVE_MAX_SETS + 1)]
+    with pytest.raises(ValueError):
+        inclusive_counts(pd.DataFrame(columns=many + ["count"], dtype=int), many)
+
+
+def test_packed_keys_beyond_64_sets():
+    """Test that more than 64 sets are counted on byte keys like the groupby"""
+    data, sets = random_membership(n_rows=3000, n_sets=100, seed=4)
+    data = (data * (np.arange(len(data))[:, None] % 9 == 0)).astype(np.int8)
+    # pandas cannot group on this many columns, so the rows are compared as tuples.
+    rows = pd.Series(list(map(tuple, data.to_numpy()))).value_counts().sort_index()
+    expected = pd.DataFrame(rows.index.tolist(), columns=sets, dtype=np.int64)
+    expected["count"] = rows.to_numpy()
+    tm.assert_frame_equal(count_intersections(data, sets), expected)
+
+    packed = count_intersections(data, sets, packed=True)
+    assert list(packed.columns) == [aggregation.PACKED_KEY, "count"]
+    tm.assert_frame_equal(aggregation.unpack_counts(packed, sets), expected)
+    np.testing.assert_array_equal(
+        aggregation.packed_degree(packed[aggregation.PACKED_KEY]),
+        expected[sets].sum(axis=1),
+    )
+
+    # A batch with missing values is counted by the groupby, then packed.
+    batches = [data.iloc[:1000], data.iloc[1000:].astype(float).assign(set0=np.nan)]
+    merged = count_intersections_chunked(batches, sets)
+    tm.assert_frame_equal(merged, count_intersections(data.iloc[:1000], sets))
+    tm.assert_frame_equal(normalize_counts(merged.iloc[::-1], sets), merged)
@@ -0,0 +1,290 @@
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+from altair_upset import CountCache, DiskCache, SpecCache, UpSetAltair
+from altair_upset.aggregation import count_intersections
+from altair_upset.cache import LRUCache, fingerprint, hash_array
+
+
+@pytest.fixture
+def membership():
+    """Create membership rows"""
+    rng = np.random.default_rng(5)
+    sets = ["a", "b", "c"]
+    data = pd.DataFrame(rng.integers(0, 2, (196_619, 3)), columns=sets)
+    data["reads"] = rng.integers(0, 5, len(data))
+    return data, sets
+
+
+def test_hash_array_detects_changes(membership):
+    """Test that changing any single value or the dtype changes the hash"""
+    data, _ = membership
+    values = data["a"].to_numpy()
+    digest = hash_array(values)
+    assert hash_array(values.copy()) == digest
+    assert hash_array(values.astype(np.int32)) != digest
+    for position in [0, 65_539, len(values) - 1]:
+        changed = values.copy()
+        changed[position] = 1 - changed[position]
+        assert hash_array(changed) != digest
+    assert hash_array(np.array(["x", "y"], dtype=object)) != hash_array(
+        np.array(["y", "x"], dtype=object)
+    )
+
+
+def test_hash_array_detects_paired_changes():
+    """Test that changes to several values do not cancel out"""
+    weights = np.ones(1 << 16)
+    changed = weights.copy()
+    changed[[3, 40_000]] = -1.0
+    assert hash_array(changed) != hash_array(weights)
+
+    # Setting the top byte of two words cancelled out in the former block hash.
+    flags = np.random.default_rng(12).integers(0, 2, 1 << 19).astype(np.uint8)
+    flags[[15, 719]] = 0
+    changed = flags.copy()
+    changed[[15, 719]] = 1
+    assert hash_array(changed) != hash_array(flags)
+
+
+def test_count_cache_paired_changes():
+    """Test that a table with two changed memberships is counted again"""
+    rng = np.random.default_rng(3)
+    sets = ["a", "b"]
+    data = pd.DataFrame(rng.integers(0, 2, (1 << 19, 2)).astype(np.uint8), columns=sets)
+    data.loc[[15, 719], "a"] = 0
+    cache = CountCache()
+    cache.count(data, sets)
+    changed = data.copy()
+    changed.loc[[15, 719], "a"] = 1
+    tm.assert_frame_equal(cache.count(changed, sets), count_intersections(changed, sets))
+    assert cache.info()[:2] == (0, 2)
+
+
+def test_fingerprint(membership):
+    """Test that fingerprints depend on the hashed columns and the options only"""
+    data, sets = membership
+    key = fingerprint(data, sets, weight=None)
+    assert fingerprint(data.assign(extra=1), sets, weight=None) == key
+    assert fingerprint(data, sets, weight="reads") != key
+    assert fingerprint(data, sets[::-1], weight=None) != key
+    assert fingerprint({s: data[s].to_numpy() for s in sets}, sets) is not None
+    assert fingerprint(iter([data]), sets) is None
+
+    # 0/1 set columns are hashed as packed keys, other values column by column.
+    key = fingerprint(data, sets, sets=sets)
+    assert fingerprint(data.astype({"a": bool}), sets, sets=sets) != key
+    changed = data.copy()
+    changed.loc[5, "a"] = 2
+    assert fingerprint(changed, sets, sets=sets) not in (key, None)
+
+
+def test_count_cache_hit_is_cheaper():
+    """Test that a cache hit costs less than counting again"""
+    rng = np.random.default_rng(7)
+    sets = [f"s{i}" for i in range(20)]
+    data = pd.DataFrame(rng.integers(0, 2, (1_000_000, 20)), columns=sets)
+    cache = CountCache()
+    cache.count(data, sets)
+
+    def best(compute):
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            compute()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    assert best(lambda: cache.count(data, sets)) < best(lambda: count_intersections(data, sets))
+    assert cache.info().hits == 5
+
+
+def test_count_cache_hits(membership):
+    """Test that a cached table is reused and equals a fresh count"""
+    data, sets = membership
+    cache = CountCache()
+    first = cache.count(data, sets)
+    second = cache.count(data.copy(), sets)
+    assert cache.info() == (1, 1, 32, 1)
+    tm.assert_frame_equal(second, count_intersections(data, sets))
+
+    # Callers may modify the returned tables.
+    second["count"] = 0
+    tm.assert_frame_equal(cache.count(data, sets), first)
+
+    cache.count(data, sets, weight="reads")
+    assert cache.info() == (2, 2, 32, 2)
+
+
+def test_count_cache_eviction(membership):
+    """Test that the least recently used table is evicted first"""
+    data, sets = membership
+    cache = CountCache(maxsize=2)
+    cache.count(data, sets)
+    cache.count(data, ["a", "b"])
+    cache.count(data, sets)
+    cache.count(data, ["b", "c"])
+    assert len(cache) == 2
+
+    cache.count(data, sets)
+    cache.count(data, ["a", "b"])
+    assert cache.info() == (2, 4, 2, 2)
+
+    cache.clear()
+    assert cache.info() == (0, 0, 2, 0)
+    with pytest.raises(ValueError):
+        CountCache(maxsize=-1)
+
+
+def test_chart_cache(membership):
+    """Test that restyling a chart reuses the counts"""
+    data, sets = membership
+    cache = CountCache()
+    chart = UpSetAltair(data=data, sets=sets, cache=cache)
+    restyled = UpSetAltair(data=data, sets=sets, width=900, cache=cache)
+    assert cache.info().hits == 1
+    uncached = UpSetAltair(data=data, sets=sets, width=900)
+    assert restyled.to_dict()["datasets"] == uncached.to_dict()["datasets"]
+    assert chart.to_dict()["datasets"] == restyled.to_dict()["datasets"]
+
+
+def test_spec_cache(membership, monkeypatch):
+    """Test that cached specs are keyed by every styling parameter and expire"""
+    data, sets = membership
+    clock = [0.0]
+    monkeypatch.setattr("altair_upset.cache.time.monotonic", lambda: clock[0])
+    specs = SpecCache(maxsize=2, ttl=60)
+
+    spec = specs.to_dict(data, sets, title="Report", width=900)
+    assert spec == specs.to_dict(data.copy(), sets, title="Report", width=900)
+    assert specs.info() == (1, 1, 2, 1)
+    chart = UpSetAltair(data=data, sets=sets, title="Report", width=900)
+    assert spec["datasets"] == chart.to_dict()["datasets"]
+
+    # Callers may modify the returned specs.
+    spec["datasets"].clear()
+    assert specs.to_dict(data, sets, title="Report", width=900)["datasets"]
+
+    specs.to_dict(data, sets, title="Report", width=900, glyph_size=50)
+    specs.to_dict(data, sets, title="Report", width=900, n_jobs=2)
+    assert specs.info() == (3, 2, 2, 2)
+
+    clock[0] = 61.0
+    specs.to_dict(data, sets, title="Report", width=900)
+    assert specs.info().misses == 3
+    with pytest.raises(ValueError):
+        SpecCache(ttl=0)
+
+
+def test_lru_cache_threads(monkeypatch):
+    """Test that a concurrent put cannot evict an entry while get reads it"""
+    cache = LRUCache(maxsize=1, ttl=60)
+    cache.put("a", 1)
+    monotonic = time.monotonic
+    evictions = []
+
+    def clock():
+        # Evict "a" from another thread while get checks its expiry.
+        if not evictions:
+            evictions.append(threading.Thread(target=cache.put, args=("b", 2)))
+            evictions[0].start()
+            evictions[0].join(0.2)
+        return monotonic()
+
+    monkeypatch.setattr("altair_upset.cache.time.monotonic", clock)
+    assert cache.get("a") == 1
+    evictions[0].join()
+    assert cache.get("a") is None and cache.get("b") == 2
+
+def test_disk_cache(membership, tmp_path):
+    """Test that stored tables are read back by a new cache on the same directory"""
+    data, sets = membership
+    expected = count_intersections(data, sets, weight="reads")
+    DiskCache(tmp_path).count(data, sets, weight="reads")
+
+    cache = DiskCache(tmp_path)
+    tm.assert_frame_equal(cache.count(data, sets, weight="reads"), expected)
+    assert cache.info()[:2] == (1, 0)
+    assert len(cache) == 1 and not list(tmp_path.glob("*.tmp"))
+
+    (next(tmp_path.glob("*.npz"))).write_bytes(b"truncated")
+    tm.assert_frame_equal(cache.count(data, sets, weight="reads"), expected)
+    assert cache.info()[:2] == (1, 1)
+
+    cache.clear()
+    assert len(cache) == 0 and cache.info().currbytes == 0
+
+
+def test_disk_cache_trim(membership, tmp_path):
+    """Test that the least recently used tables are deleted beyond max_bytes"""
+    data, sets = membership
+    cache = DiskCache(tmp_path)
+    cache.count(data, sets)
+    size = cache.info().currbytes
+
+    cache.max_bytes = 2 * size + size // 2
+    cache.count(data, ["a", "b", "c"][::-1])
+    cache.count(data, sets)  # now more recent than the reversed table
+    cache.count(data, ["b", "a", "c"])
+    assert len(cache) == 2
+    cache.count(data, sets)
+    assert cache.info()[:2] == (2, 3)
+
+
+def _count_in_process(directory, data, sets):
+    return DiskCache(directory).count(data, sets)
+
+
+def test_disk_cache_processes(membership, tmp_path):
+    """Test that concurrent processes can fill and read the same table"""
+    data, sets = membership
+    with ProcessPoolExecutor(4) as executor:
+        tables = list(executor.map(_count_in_process, *zip(*[(tmp_path, data, sets)] * 8)))
+    for table in tables:
+        tm.assert_frame_equal(table, count_intersections(data, sets))
+    assert len(DiskCache(tmp_path)) == 1
+
+
+def test_csv_cache(tmp_path):
+    """Test that from_csv reuses the counts of a file until its contents change"""
+    sets = ["Fever", "Cough", "Anosmia"]
+    path = tmp_path / "symptoms.csv"
+    shutil.copy("tests/test_data/covid_symptoms_table.csv", path)
+    cache = DiskCache(tmp_path / "cache")
+
+    chart = UpSetAltair.from_csv(path, sets=sets, cache=cache)
+    cached = UpSetAltair.from_csv(str(path), sets=sets, chunksize=7, cache=cache)
+    assert cache.info()[:2] == (1, 1)
+    assert cached.to_dict()["datasets"] == chart.to_dict()["datasets"]
+
+    with open(path, "a") as f:
+        f.write(",".join(["1"] * len(pd.read_csv(path, nrows=0).columns)) + "\n")
+    UpSetAltair.from_csv(path, sets=sets, cache=cache)
+    assert cache.info()[:2] == (1, 2)
+
+
+def test_csv_cache_paired_edits(tmp_path):
+    """Test that two edits of a cached file within one word offset are seen"""
+    rng = np.random.default_rng(4)
+    path = tmp_path / "flags.csv"
+    pd.DataFrame(rng.integers(0, 2, (1 << 17, 2)), columns=["ab", "c"]).to_csv(path, index=False)
+    text = bytearray(path.read_bytes())
+    # Bytes 15 and 719 are values of "ab"; these edits cancelled out in the
+    # former block hash.
+    text[15:16] = text[719:720] = b"0"
+    path.write_bytes(bytes(text))
+    cache = DiskCache(tmp_path / "cache")
+    UpSetAltair.from_csv(path, sets=["ab", "c"], cache=cache)
+
+    text[15:16] = text[719:720] = b"1"
+    path.write_bytes(bytes(text))
+    chart = UpSetAltair.from_csv(path, sets=["ab", "c"], cache=cache)
+    assert cache.info()[:2] == (0, 2)
+    expected = UpSetAltair.from_csv(path, sets=["ab", "c"])
+    assert chart.to_dict()["datasets"] == expected.to_dict()["datasets"]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+from altair_upset import UpSetAltair
+from altair_upset.aggregation import arrow_columns, count_intersections
+
+pa = pytest.importorskip("pyarrow")
+pl = pytest.importorskip("polars")
+
+
+@pytest.fixture
+def membership():
+    """Create random membership data with an unrelated attribute column"""
+    rng = np.random.default_rng(1)
+    sets = ["a", "b", "c", "d"]
+    data = pd.DataFrame(rng.integers(0, 2, (500, 4)), columns=sets)
+    data["label"] = "x"
+    return data, sets
+
+
+def test_arrow_table(membership):
+    """Test counting an Arrow table with several record batches"""
+    data, sets = membership
+    table = pa.Table.from_batches(
+        pa.Table.from_pandas(data, preserve_index=False).to_batches(max_chunksize=64)
+    )
+    tm.assert_frame_equal(count_intersections(table, sets), count_intersections(data, sets))
+
+
+def test_arrow_reader(membership):
+    """Test counting a stream of record batches"""
+    data, sets = membership
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    reader = pa.RecordBatchReader.from_batches(table.schema, table.to_batches(max_chunksize=100))
+    tm.assert_frame_equal(count_intersections(reader, sets), count_intersections(data, sets))
+
+
+def test_arrow_columns_are_zero_copy(membership):
+    """Test that integer set columns are viewed, not copied"""
+    data, sets = membership
+    batch = pa.RecordBatch.from_pandas(data, preserve_index=False)
+    columns = arrow_columns(batch, sets)
+    assert sorted(columns) == sets
+    assert not any(column.flags.writeable for column in columns.values())
+
+
+def test_arrow_nulls_are_dropped():
+    """Test that rows with missing membership are dropped as in the groupby"""
+    table = pa.table({"a": [1, None, 0, 1], "b": [1, 1, 0, 1]})
+    expected = count_intersections(pd.DataFrame({"a": [1, 0, 1], "b": [1, 0, 1]}), ["a", "b"])
+    counts = count_intersections(table, ["a", "b"])
+    assert counts[["a", "b"]].astype(int).values.tolist() == [[0, 0], [1, 1]]
+    assert counts["count"].tolist() == expected["count"].tolist()
+
+
+def test_polars(membership):
+    """Test counting Polars DataFrames and LazyFrames"""
+    data, sets = membership
+    frame = pl.from_pandas(data)
+    expected = count_intersections(data, sets)
+    tm.assert_frame_equal(count_intersections(frame, sets), expected)
+    tm.assert_frame_equal(count_intersections(frame.lazy(), sets), expected)
+
+
+def test_chart_from_arrow(membership):
+    """Test that an Arrow table draws the same chart as the pandas frame"""
+    data, sets = membership
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    assert (
+        UpSetAltair(data=table, sets=sets).to_dict()["datasets"]
+        == UpSetAltair(data=data, sets=sets).to_dict()["datasets"]
+    )
+
+
+def test_weighted_native_inputs(membership):
+    """Test weighted counting of Arrow and Polars inputs"""
+    data, sets = membership
+    data["reads"] = np.linspace(0, 10, len(data))
+    expected = count_intersections(data, sets, weight="reads")
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    tm.assert_frame_equal(count_intersections(table, sets, weight="reads"), expected)
+    tm.assert_frame_equal(
+        count_intersections(pl.from_pandas(data), sets, weight="reads"), expected
+    )
@@ -0,0 +1,315 @@
+import json
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+from altair_upset import UpSetAltair
+from altair_upset.aggregation import count_intersections
+from altair_upset.transforms import (
+    compact_counts,
+    create_membership_calculation,
+    expected_sizes,
+    filter_intersections,
+    layout_counts,
+    preprocess_data,
+    set_sizes,
+)
+
+
+@pytest.fixture
+def wide_data():
+    """Create a frame with a few set columns and many attribute columns"""
+    rng = np.random.default_rng(3)
+    sets = ["set1", "set2", "set3"]
+    data = pd.DataFrame(rng.random((20_000, 200)), columns=[f"attr{i}" for i in range(200)])
+    for s in sets:
+        data[s] = rng.integers(0, 2, len(data))
+    return data, sets
+
+
+def test_preprocess_does_not_mutate(wide_data):
+    """Test that preprocessing leaves the caller's frame untouched"""
+    data, sets = wide_data
+    before = data.copy()
+    preprocess_data(data, sets, None, "frequency", "ascending")
+    UpSetAltair(data=data, sets=sets)
+    tm.assert_frame_equal(data, before)
+
+
+def test_preprocess_peak_memory(wide_data):
+    """Test that preprocessing only touches the set columns"""
+    data, sets = wide_data
+    frame_bytes = data.memory_usage(index=False).sum()
+    set_bytes = data[sets].memory_usage(index=False).sum()
+
+    tracemalloc.start()
+    try:
+        preprocess_data(data, sets, None, "frequency", "ascending")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < set_bytes
+    assert peak < frame_bytes / 100
+
+
+def test_compact_dtypes(sample_data):
+    """Test that the long-form table uses compact dtypes"""
+    sets = ["set1", "set2", "set3"]
+    data = preprocess_data(sample_data, sets, None, "frequency", "ascending")["data"]
+    assert data["is_intersect"].dtype == np.uint8
+    assert isinstance(data["set"].dtype, pd.CategoricalDtype)
+    assert list(data["set"].cat.categories) == sets
+    for column in ["intersection_id", "count", "degree"]:
+        assert data[column].dtype == np.uint8
+
+
+def test_compact_dtypes_keep_weighted_floats(sample_data):
+    """Test that float weights are not rounded by the downcast"""
+    sets = ["set1", "set2", "set3"]
+    weighted = sample_data.assign(w=[0.5, 1.25, 2.0, 3.0])
+    data = preprocess_data(weighted, sets, None, "frequency", "ascending", weight="w")["data"]
+    assert data["count"].dtype == np.float64
+    assert sorted(data["count"].unique()) == [0.5, 1.25, 2.0, 3.0]
+
+
+@pytest.fixture
+def count_table():
+    """Create an intersection table with distinct sizes"""
+    sets = ["a", "b", "c"]
+    table = pd.DataFrame(
+        [
+            [0, 0, 0, 50],
+            [0, 0, 1, 5],
+            [0, 1, 0, 9],
+            [0, 1, 1, 2],
+            [1, 0, 0, 7],
+            [1, 0, 1, 1],
+            [1, 1, 0, 4],
+            [1, 1, 1, 3],
+        ],
+        columns=sets + ["count"],
+    )
+    return table, sets
+
+
+def test_filter_top_k(count_table):
+    """Test that top_k keeps the largest non-empty intersections in order"""
+    table, sets = count_table
+    kept = filter_intersections(table, sets, top_k=3)
+    assert kept["count"].tolist() == [5, 9, 7]
+
+
+def test_filter_size_and_degree(count_table):
+    """Test the minimum size and degree range filters"""
+    table, sets = count_table
+    assert filter_intersections(table, sets, min_size=4)["count"].tolist() == [5, 9, 7, 4]
+    kept = filter_intersections(table, sets, min_degree=2, max_degree=2)
+    assert kept["count"].tolist() == [2, 1, 4]
+
+
+def test_filter_other_bucket(count_table):
+    """Test that dropped intersections are summed into an Other bucket"""
+    table, sets = count_table
+    kept = filter_intersections(table, sets, top_k=2, other=True)
+    assert kept["count"].tolist() == [9, 7, 5 + 2 + 1 + 4 + 3]
+    assert kept["other"].tolist() == [0, 0, 1]
+    assert kept.loc[2, sets].tolist() == [0, 0, 0]
+    assert filter_intersections(table, sets) is table
+
+
+def test_chart_with_other(sample_data):
+    """Test that the chart keeps the Other bucket through the degree filter"""
+    sets = ["set1", "set2", "set3"]
+    spec = UpSetAltair(data=sample_data, sets=sets, top_k=2, other=True).to_dict()
+    values = next(iter(spec["datasets"].values()))
+    assert {row["intersection_id"] for row in values} == {0, 1, 2}
+    assert sum(row["other"] for row in values) == len(sets)
+    filters = [t["filter"] for t in spec["transform"] if "filter" in t]
+    assert "(datum['other'] === 1)" in str(filters)
+
+
+def test_chart_other_last(count_table):
+    """Test that the Other bucket is ranked last and labelled in the matrix"""
+    table, sets = count_table
+    for sort_by in ["frequency", "degree"]:
+        for sort_order in ["ascending", "descending"]:
+            options = dict(sets=sets, top_k=2, other=True, sort_by=sort_by, sort_order=sort_order)
+            spec = UpSetAltair.from_counts(table, **options).to_dict()
+            key = next(t for t in spec["transform"] if t.get("as") == "sort_key")
+            last = "-1" if sort_order == "descending" else "MAX_VALUE"
+            assert key["calculate"].startswith(f"datum['other'] == 1 ? {last} :")
+            assert spec["vconcat"][0]["layer"][0]["encoding"]["x"]["sort"]["field"] == "sort_key"
+            assert '"text": {"value": "Other"}' in json.dumps(spec)
+
+            precomputed = UpSetAltair.from_counts(table, layout="precomputed", **options)
+            cells, _ = precomputed.to_dict()["datasets"].values()
+            last_id = max(row["intersection_id"] for row in cells)
+            assert {row["other"] for row in cells if row["intersection_id"] == last_id} == {1}
+
+
+def test_set_sizes_ignore_filters(count_table):
+    """Test that Set Size bars count the intersections left out by the filters"""
+    table, sets = count_table
+    expected = [7 + 1 + 4 + 3, 9 + 2 + 4 + 3, 5 + 2 + 1 + 3]
+    assert set_sizes(table, sets).tolist() == expected
+    assert set_sizes(filter_intersections(table, sets, top_k=2), sets).tolist() != expected
+
+    spec = UpSetAltair.from_counts(table, sets, top_k=2).to_dict()
+    lookup = next(t["from"] for t in spec["transform"] if "lookup" in t)
+    assert lookup["fields"] == ["set_abbre", "set_size"]
+    assert [row["set_size"] for row in spec["datasets"][lookup["data"]["name"]]] == expected
+    x = spec["vconcat"][1]["hconcat"][2]["encoding"]["x"]
+    assert (x["field"], x["aggregate"]) == ("set_size", "max")
+
+    precomputed = UpSetAltair.from_counts(table, sets, top_k=2, layout="precomputed")
+    _, set_data = precomputed.to_dict()["datasets"].values()
+    assert [row["set_size"] for row in set_data] == expected
+
+
+def test_chart_inclusive(sample_data):
+    """Test that inclusive mode draws overlapping sizes and keeps Set Size per set"""
+    sets = ["set1", "set2", "set3"]
+    spec = UpSetAltair(data=sample_data, sets=sets, intersection_mode="inclusive").to_dict()
+    values = next(iter(spec["datasets"].values()))
+    sizes = {row["intersection_id"]: (row["degree"], row["count"]) for row in values}
+    assert sorted(sizes.values()) == [(0, 4), (1, 3), (1, 3), (1, 3), (2, 2), (2, 2), (2, 2), (3, 1)]
+    transforms = spec["transform"]
+    aggregate = next(t["aggregate"] for t in transforms if "aggregate" in t)
+    assert aggregate == [{"op": "max", "field": "count", "as": "count"}]
+    lookup = next(t["from"] for t in transforms if "lookup" in t)
+    assert [row["set_size"] for row in spec["datasets"][lookup["data"]["name"]]] == [3, 3, 3]
+
+    with pytest.raises(ValueError):
+        UpSetAltair(data=sample_data, sets=sets, intersection_mode="union")
+    with pytest.raises(ValueError):
+        UpSetAltair(data=sample_data, sets=sets, intersection_mode="inclusive", other=True)
+
+
+def test_chart_inclusive_many_sets():
+    """Test inclusive charts of six sets and the bound on their combinations"""
+    data = pd.read_csv("tests/test_data/covid_symptoms_table.csv")
+    sets = data.columns.drop("id").tolist()
+    spec = UpSetAltair(data=data, sets=sets, intersection_mode="inclusive").to_dict()
+    values = next(iter(spec["datasets"].values()))
+    assert len({row["intersection_id"] for row in values}) == 2 ** len(sets)
+
+    rng = np.random.default_rng(6)
+    sets = [f"set{i}" for i in range(12)]
+    data = pd.DataFrame(rng.integers(0, 2, (500, 12)), columns=sets)
+    with pytest.raises(ValueError, match="max_degree"):
+        UpSetAltair(data=data, sets=sets, intersection_mode="inclusive")
+    spec = UpSetAltair(data=data, sets=sets, intersection_mode="inclusive", max_degree=2)
+    values = next(iter(spec.to_dict()["datasets"].values()))
+    assert len({row["intersection_id"] for row in values}) == 12 + 66
+
+def test_chart_many_sets():
+    """Test a chart of more than 64 sets, filtered before decoding"""
+    rng = np.random.default_rng(8)
+    sets = [f"gene_set_{i}" for i in range(200)]
+    data = pd.DataFrame((rng.random((500, 200)) < 0.01).astype(np.uint8), columns=sets)
+    spec = UpSetAltair(data=data, sets=sets, top_k=5, other=True).to_dict()
+    values = next(iter(spec["datasets"].values()))
+    assert len({row["intersection_id"] for row in values}) == 6
+    assert len(values) == 6 * len(sets)
+    drawn = sum(row["count"] for row in values if row["set"] == sets[0])
+    assert drawn == (data.sum(axis=1) > 0).sum()
+
+
+def test_expected_sizes(sample_data):
+    """Test expected sizes against the product of set shares, packed or not"""
+    sets = ["set1", "set2", "set3"]
+    counts = count_intersections(sample_data, sets)
+    shares = sample_data[sets].mean()
+    brute = [
+        len(sample_data) * np.prod([shares[s] if row[s] else 1 - shares[s] for s in sets])
+        for _, row in counts.iterrows()
+    ]
+    np.testing.assert_allclose(expected_sizes(counts, sets), brute)
+    packed = count_intersections(sample_data, sets, packed=True)
+    np.testing.assert_allclose(expected_sizes(packed, sets), expected_sizes(counts, sets))
+    assert expected_sizes(counts.assign(count=0), sets).tolist() == [0] * len(counts)
+
+
+def test_chart_deviation(sample_data):
+    """Test that the deviation bars sit between the cardinality bars and the matrix"""
+    sets = ["set1", "set2", "set3"]
+    spec = UpSetAltair(data=sample_data, sets=sets, deviation=True).to_dict()
+    assert len(spec["vconcat"]) == 3
+    assert spec["vconcat"][1]["encoding"]["y"]["field"] == "deviation"
+    tooltip = spec["vconcat"][0]["layer"][0]["encoding"]["tooltip"]
+    assert [t["title"] for t in tooltip] == ["Cardinality", "Expected", "Deviation", "Degree"]
+    values = next(iter(spec["datasets"].values()))
+    expected = expected_sizes(count_intersections(sample_data, sets), sets)
+    shown = {row["intersection_id"]: row["expected"] for row in values}
+    np.testing.assert_allclose(sorted(shown.values()), sorted(expected))
+    assert len(UpSetAltair(data=sample_data, sets=sets).to_dict()["vconcat"]) == 2
+
+
+def test_layout_counts():
+    """Test the ranks, set orders and set sizes of the precomputed layout"""
+    sets = ["set1", "set2", "set3"]
+    counts = pd.DataFrame(
+        {"set1": [1, 0, 1, 0], "set2": [1, 1, 0, 0], "set3": [1, 0, 0, 0], "count": [2, 5, 3, 9]}
+    )
+    cells, set_data = layout_counts(counts, sets, ["A", "B", "C"], "frequency", "descending")
+
+    ranked = cells.drop_duplicates("intersection_id").sort_values("intersection_id")
+    assert ranked["count"].is_monotonic_decreasing
+    assert set(cells["set_abbre"]) == {"A", "B", "C"}
+    assert (cells["set_order"] == cells["set"].cat.codes + 1).all()
+    assert ranked["count"].tolist() == [5, 3, 2]
+    assert set_data["set_size"].tolist() == [5, 7, 2]
+
+    cells, _ = layout_counts(counts, sets, sets, "degree", "ascending")
+    assert cells.drop_duplicates("intersection_id").sort_values("intersection_id")["degree"].is_monotonic_increasing
+
+
+def test_chart_precomputed(sample_data):
+    """Test that the precomputed layout ships the final rows without reshaping them in Vega"""
+    sets = ["set1", "set2", "set3"]
+    spec = UpSetAltair(data=sample_data, sets=sets, layout="precomputed").to_dict()
+    assert "pivot" not in str(spec) and "fold" not in str(spec)
+    cells, set_data = spec["datasets"].values()
+    assert {"degree", "set_abbre", "set_order"} <= set(cells[0])
+    assert [row["set_size"] for row in set_data] == sample_data[sets].sum().tolist()
+
+    default = next(iter(UpSetAltair(data=sample_data, sets=sets).to_dict()["datasets"].values()))
+    assert sorted(row["count"] for row in cells) == sorted(row["count"] for row in default)
+    with pytest.raises(ValueError):
+        UpSetAltair(data=sample_data, sets=sets, layout="server")
+
+
+def test_compact_counts(sample_data):
+    """Test that the members strings encode the set columns in order"""
+    sets = ["set1", "set2", "set3"]
+    counts = count_intersections(sample_data, sets)
+    compact = compact_counts(counts.assign(other=0), sets)
+    assert compact.columns.tolist() == ["members", "count", "other"]
+    decoded = compact["members"].apply(lambda m: [int(c) for c in m]).tolist()
+    assert decoded == counts[sets].values.tolist()
+
+    calculation = create_membership_calculation(sets, "selector001")
+    assert list(calculation) == sets
+    assert "substring(datum['members'], 2, 3)" in calculation["set3"]
+    assert 'vlSelectionTest("selector001_store", {set: "set3"})' in calculation["set3"]
+
+
+def test_chart_compact_payload():
+    """Test that the compact payload is much smaller and unpacked before the aggregate"""
+    rng = np.random.default_rng(4)
+    sets = [f"set{i}" for i in range(30)]
+    data = pd.DataFrame((rng.random((5000, 30)) < 0.1).astype(np.uint8), columns=sets)
+    sizes = {}
+    for payload in ["long", "compact"]:
+        spec = UpSetAltair(data=data, sets=sets, top_k=50, width=3000, payload=payload).to_dict()
+        sizes[payload] = len(str(next(iter(spec["datasets"].values()))))
+    assert sizes["compact"] * 20 < sizes["long"]
+
+    transforms = spec["transform"]
+    assert list(transforms[0]) == ["calculate", "as"] and transforms[30]["aggregate"]
+    assert "pivot" not in str(spec)
+    with pytest.raises(ValueError):
+        UpSetAltair(data=data, sets=sets, payload="compact", layout="precomputed")
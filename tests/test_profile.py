@@ -0,0 +1,77 @@
+import json
+import warnings
+
+import pytest
+from altair_upset import UpSetAltair, explain, profile_spec
+from altair_upset.profile import SpecBudgetWarning
+
+SETS = ["set1", "set2", "set3"]
+
+
+def test_profile_spec(sample_data):
+    """Test the tables, transform steps and mark estimates of each layer"""
+    chart = UpSetAltair(data=sample_data, sets=SETS)
+    spec = chart.to_dict()
+    profile = profile_spec(chart)
+
+    assert profile.bytes == len(json.dumps(spec))
+    assert [d.rows for d in profile.datasets] == [12, 3, 3]
+    assert [d.name for d in profile.datasets] == list(spec["datasets"])
+    # Bars and labels per intersection, matrix cells and member cells, bars per set.
+    assert [layer.marks for layer in profile.layers] == [4, 4, 8, 12, 4, 9, 3, 3]
+    assert profile.marks == 47 and profile.warnings == []
+    assert profile.layers[0].transforms[:3] == ["filter", "pivot", "aggregate"]
+
+    precomputed = profile_spec(UpSetAltair(data=sample_data, sets=SETS, layout="precomputed"))
+    assert [layer.marks for layer in precomputed.layers] == [4, 4, 8, 12, 4, 9, 3, 3]
+    assert max(len(layer.transforms) for layer in precomputed.layers) == 2
+
+    compact = profile_spec(UpSetAltair(data=sample_data, sets=SETS, payload="compact"))
+    assert compact.marks == 47
+
+
+
+def test_profile_reads_field_predicates(sample_data):
+    """Test that matrix layers are told apart by their field predicates"""
+    chart = UpSetAltair(data=sample_data, sets=SETS, top_k=2, other=True)
+    matrix = chart.to_dict()["vconcat"][1]["hconcat"][0]["layer"]
+    filters = [layer["transform"][-1]["filter"] for layer in matrix if "transform" in layer]
+    assert filters == [
+        {"field": "set_order", "oneOf": [1, 3]},
+        {"field": "is_intersect", "equal": 1},
+        {"field": "is_intersect", "equal": 1},
+        {"field": "other", "equal": 1},
+    ]
+    profile = profile_spec(chart)
+    # Stripes on sets 1 and 3, member cells, and one "Other" label.
+    assert [layer.marks for layer in profile.layers[2:7]] == [6, 9, 3, 5, 1]
+
+def test_profile_budgets(sample_data):
+    """Test that budgets warn and can gate a pipeline"""
+    chart = UpSetAltair(data=sample_data, sets=SETS)
+    with pytest.warns(SpecBudgetWarning) as record:
+        profile = profile_spec(chart, max_bytes=1000, max_rows=10, max_marks=40)
+    budget_warnings = [w for w in record if w.category is SpecBudgetWarning]
+    assert len(budget_warnings) == len(profile.warnings) == 3
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SpecBudgetWarning)
+        with pytest.raises(SpecBudgetWarning):
+            profile_spec(chart.to_json(), max_marks=10)
+
+
+def test_explain_url_data(sample_data, tmp_path):
+    """Test that sidecar files are read to report their tables"""
+    chart = UpSetAltair(
+        data=sample_data, sets=SETS, data_mode="url", data_dir=tmp_path, data_format="csv"
+    )
+    profile = profile_spec(chart)
+    assert sorted(d.rows for d in profile.datasets) == [3, 3, 12]
+    for dataset in profile.datasets:
+        assert dataset.bytes == (tmp_path / dataset.name.split("/")[-1]).stat().st_size
+    assert profile.marks == 47
+
+    text = explain(chart, max_marks=10)
+    assert text.splitlines()[0] == f"Spec: {profile.bytes:,} bytes of JSON"
+    assert "vconcat[1].hconcat[0].layer[0] rect: ~8 marks" in text
+    assert text.splitlines()[-1].startswith("Warning: About 47 marks")
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from altair_upset import SetSketch, UpSetAltair
+from altair_upset.aggregation import count_set_memberships
+from altair_upset.sketch import sketch_intersections
+
+
+@pytest.fixture
+def large_sets():
+    """Create three overlapping sets of integer IDs, too large for exact sketches"""
+    rng = np.random.default_rng(3)
+    ids = np.arange(200_000)
+    return {
+        "A": ids[rng.random(len(ids)) < 0.5],
+        "B": ids[rng.random(len(ids)) < 0.3],
+        "C": ids[100_000:][rng.random(100_000) < 0.6],
+    }
+
+
+def test_estimate(large_sets):
+    """Test that the estimate is within a few relative errors of the true size"""
+    ids = large_sets["A"]
+    sketch = SetSketch(k=4096, elements=ids)
+    assert abs(sketch.estimate() / len(ids) - 1) < 3 / np.sqrt(4096)
+    assert SetSketch(k=4096, elements=["x", "y", "x"]).estimate() == 2
+
+
+def test_merge_and_bytes(large_sets):
+    """Test that merged part sketches equal the sketch of the whole set"""
+    ids = large_sets["B"]
+    parts = [SetSketch(k=512, elements=part).to_bytes() for part in np.array_split(ids, 4)]
+    merged = SetSketch.from_bytes(parts[0]).merge(*map(SetSketch.from_bytes, parts[1:]))
+    whole = SetSketch(k=512).update(iter(ids))
+    assert merged.k == 512
+    np.testing.assert_array_equal(merged.hashes, whole.hashes)
+    with pytest.raises(ValueError):
+        SetSketch(k=1)
+
+
+def test_sketch_intersections(large_sets):
+    """Test that exact intersections fall within the reported error margins"""
+    sets = ["A", "B", "C"]
+    exact = count_set_memberships(large_sets, sets)
+    sketches = {s: SetSketch(k=8192, elements=ids) for s, ids in large_sets.items()}
+    estimated = sketch_intersections(sketches, sets)
+
+    assert estimated[sets].values.tolist() == exact[sets].values.tolist()
+    misses = np.abs(estimated["count"] - exact["count"]) > estimated["error"]
+    assert misses.sum() <= 1
+    assert (estimated["error"] < 0.1 * exact["count"].sum()).all()
+
+
+def test_sketch_intersections_small():
+    """Test that sets smaller than k are counted exactly"""
+    memberships = {"A": [1, 2, 3], "B": [3, 4], "C": [4, 5, 6, 7]}
+    sketches = {s: [SetSketch(elements=ids[:1]), SetSketch(elements=ids[1:])] for s, ids in memberships.items()}
+    estimated = sketch_intersections(sketches)
+    exact = count_set_memberships(memberships)
+    assert estimated["count"].tolist() == exact["count"].tolist()
+    assert (estimated["error"] == 0).all()
+
+
+def test_chart_from_sketches(large_sets):
+    """Test that the chart shows the error margin in the tooltip"""
+    sketches = {s: SetSketch(k=1024, elements=ids) for s, ids in large_sets.items()}
+    spec = UpSetAltair.from_sketches(sketches, top_k=3, other=True).to_dict()
+    tooltip = spec["vconcat"][0]["layer"][0]["encoding"]["tooltip"]
+    assert [t["title"] for t in tooltip] == ["Cardinality", "± Error (95%)", "Degree"]
+    values = next(iter(spec["datasets"].values()))
+    assert all(row["error_sq"] > 0 for row in values)
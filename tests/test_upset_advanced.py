@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 import pandas as pd
 from altair_upset import UpSetAltair
@@ -57,4 +58,127 @@ def test_duplicate_width_signal():
         return width_props
     
     width_props = count_width_properties(chart_dict)
-    assert len(width_props) <= 4 
\ No newline at end of file
+    assert len(width_props) <= 4 
+
+def _chart_json(n_intersections, abbre=None):
+    sets = [f"set{i}" for i in range(8)]
+    bits = (pd.Series(range(1, n_intersections + 1)).to_numpy()[:, None] >> range(8)) & 1
+    counts = pd.DataFrame(bits, columns=sets).assign(count=range(1000, 1000 + n_intersections))
+    return UpSetAltair.from_counts(counts, sets, abbre=abbre).to_json()
+
+
+def test_many_intersections():
+    """Test that bars keep a positive width when intersections outnumber pixels"""
+    rng = np.random.default_rng(1)
+    sets = [f"set{i}" for i in range(7)]
+    data = pd.DataFrame(rng.integers(0, 2, (2000, 7)), columns=sets)
+    for options in [{}, {"layout": "precomputed"}, {"payload": "compact"}]:
+        spec = UpSetAltair(data=data, sets=sets, **options).to_dict()
+        assert spec["vconcat"][0]["layer"][0]["mark"]["size"] == 1
+
+def test_datasets_stored_once(sample_data):
+    """Test that every table is stored once at the top level and referenced by name"""
+    sets = ["set1", "set2", "set3"]
+    for layout in ["vega", "precomputed"]:
+        spec = UpSetAltair(data=sample_data, sets=sets, layout=layout).to_dict()
+        names = []
+
+        def collect(node):
+            if isinstance(node, dict):
+                assert "values" not in node
+                if isinstance(node.get("data"), dict):
+                    names.append(node["data"]["name"])
+                for key, value in node.items():
+                    if key != "datasets":
+                        collect(value)
+            elif isinstance(node, list):
+                for value in node:
+                    collect(value)
+
+        collect(spec)
+        assert set(names) == set(spec["datasets"])
+
+
+def test_spec_size_is_linear():
+    """Test that the spec grows linearly with intersections and not with layers"""
+    sizes = {n: len(_chart_json(n)) for n in [50, 100, 200]}
+    assert sizes[200] - sizes[100] == pytest.approx(2 * (sizes[100] - sizes[50]), rel=0.05)
+
+    # Single-letter abbreviations add a label background layer over the same tables.
+    abbre = list("ABCDEFGH")
+    long_abbre = [a * 3 for a in abbre]
+    extra = [len(_chart_json(n, abbre)) - len(_chart_json(n, long_abbre)) for n in [50, 200]]
+    assert 0 < extra[0] == extra[1]
+
+
+def test_data_mode_url(sample_data, tmp_path):
+    """Test that tables go to content-named sidecar files referenced by URL"""
+    import json
+
+    sets = ["set1", "set2", "set3"]
+    inline = UpSetAltair(data=sample_data, sets=sets).to_dict()
+    chart = UpSetAltair(
+        data=sample_data, sets=sets, data_mode="url", data_dir=tmp_path, data_url="static/upset"
+    )
+    spec = chart.to_dict()
+    assert "datasets" not in spec
+    files = sorted(tmp_path.iterdir())
+    assert [f.stem for f in files] == sorted(inline["datasets"])
+    for f in files:
+        assert json.loads(f.read_text()) == inline["datasets"][f.stem]
+        assert f"static/upset/{f.name}" in json.dumps(spec)
+
+    UpSetAltair(data=sample_data, sets=sets, width=900, data_mode="url", data_dir=tmp_path)
+    assert sorted(tmp_path.iterdir()) == files
+
+    csv_dir = tmp_path / "csv"
+    spec = UpSetAltair(
+        data=sample_data, sets=sets, data_mode="url", data_dir=csv_dir, data_format="csv"
+    ).to_dict()
+    data = spec["data"]
+    source = pd.read_csv(csv_dir / data["url"].split("/")[-1])
+    assert len(source) == len(next(iter(inline["datasets"].values())))
+    assert data["format"]["parse"]["is_intersect"] == "number"
+
+    with pytest.raises(ValueError):
+        UpSetAltair(data=sample_data, sets=sets, data_mode="file")
+
+
+def test_data_mode_url_max_rows(tmp_path):
+    """Test that sidecar files are not limited to the inline max_rows"""
+    import altair as alt
+
+    rng = np.random.default_rng(2)
+    sets = [f"set{i}" for i in range(12)]
+    data = pd.DataFrame(rng.integers(0, 2, (3000, 12)), columns=sets)
+    with pytest.raises(alt.MaxRowsError):
+        UpSetAltair(data=data, sets=sets)
+    for data_format in ["json", "csv"]:
+        directory = tmp_path / data_format
+        chart = UpSetAltair(
+            data=data, sets=sets, data_mode="url", data_dir=directory, data_format=data_format
+        )
+        assert "datasets" not in chart.to_dict()
+        read = pd.read_json if data_format == "json" else pd.read_csv
+        assert max(len(read(f)) for f in directory.iterdir()) > 5000
+
+def test_shared_pipeline(sample_data):
+    """Test that the Vega transforms are set once on the top-level chart"""
+    import json
+
+    sets = ["set1", "set2", "set3"]
+    for payload in ["long", "compact"]:
+        spec = UpSetAltair(data=sample_data, sets=sets, payload=payload).to_dict()
+        assert [next(iter(t)) for t in spec["transform"]][-3:] == ["lookup", "filter", "window"]
+        views = json.dumps(spec["vconcat"])
+        assert '"fold"' not in views and '"lookup"' not in views
+
+        matrix = spec["vconcat"][1]["hconcat"][0]["layer"]
+        marks = [layer["mark"] for layer in matrix]
+        assert [m if isinstance(m, str) else m["type"] for m in marks] == [
+            "rect",
+            "circle",
+            "bar",
+            "circle",
+        ]
+        assert "selection" in matrix[0]
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+import altair as alt
+from altair_upset import UpSetIndex
+from altair_upset.aggregation import count_intersections
+
+
+@pytest.fixture
+def batches():
+    """Create three batches of random membership rows with a weight column"""
+    rng = np.random.default_rng(2)
+    sets = ["a", "b", "c"]
+    frames = []
+    for _ in range(3):
+        frame = pd.DataFrame(rng.integers(0, 2, (200, 3)), columns=sets)
+        frame["reads"] = rng.integers(0, 5, len(frame))
+        frames.append(frame)
+    return frames, sets
+
+
+def test_add_matches_full_count(batches):
+    """Test that adding batches matches counting all rows at once"""
+    frames, sets = batches
+    index = UpSetIndex(sets)
+    for frame in frames:
+        index.add(frame)
+    tm.assert_frame_equal(index.counts, count_intersections(pd.concat(frames), sets))
+
+
+def test_remove(batches):
+    """Test that removing a batch restores the earlier counts"""
+    frames, sets = batches
+    index = UpSetIndex(sets, weight="reads").add(frames[0]).add(frames[1])
+    index.remove(frames[1])
+    tm.assert_frame_equal(
+        index.counts, count_intersections(frames[0], sets, weight="reads")
+    )
+
+
+def test_remove_drops_empty_intersections():
+    """Test that intersections without rows disappear after a removal"""
+    index = UpSetIndex(["a", "b"])
+    index.add(pd.DataFrame({"a": [1, 0], "b": [1, 1]}))
+    index.remove(pd.DataFrame({"a": [0], "b": [1]}))
+    assert index.counts.values.tolist() == [[1, 1, 1]]
+    with pytest.raises(ValueError, match="never added"):
+        index.remove(pd.DataFrame({"a": [0], "b": [1]}))
+
+
+def test_chart(batches):
+    """Test rendering the current counts"""
+    frames, sets = batches
+    index = UpSetIndex(sets).add(frames[0])
+    assert isinstance(index.chart(title="Live"), alt.VConcatChart)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from altair_upset import UpSetAltair
+
+SYMPTOMS_CSV = "tests/test_data/covid_symptoms_table.csv"
+SYMPTOMS = ["Shortness of Breath", "Diarrhea", "Fever", "Cough", "Anosmia", "Fatigue"]
+
+
+def chart_values(chart):
+    """Return the records shipped with a chart"""
+    spec = chart.to_dict()
+    return next(iter(spec["datasets"].values()))
+
+
+def test_from_csv_matches_dataframe():
+    """Test that reading a CSV in chunks gives the same chart data"""
+    expected = UpSetAltair(data=pd.read_csv(SYMPTOMS_CSV), sets=SYMPTOMS)
+    chart = UpSetAltair.from_csv(SYMPTOMS_CSV, sets=SYMPTOMS, chunksize=100)
+    assert chart_values(chart) == chart_values(expected)
+
+
+def test_from_batches(sample_data):
+    """Test building a chart from an iterator of DataFrame batches"""
+    sets = ["set1", "set2", "set3"]
+    batches = iter([sample_data.iloc[:2], sample_data.iloc[2:]])
+    chart = UpSetAltair.from_batches(batches, sets=sets, title="Batches")
+    assert chart_values(chart) == chart_values(UpSetAltair(data=sample_data, sets=sets))
+
+
+def test_from_sets(sample_data):
+    """Test building a chart from a set-to-elements mapping"""
+    sets = ["set1", "set2", "set3"]
+    memberships = {s: sample_data.index[sample_data[s] == 1] for s in sets}
+    chart = UpSetAltair.from_sets(memberships, title="Sets")
+    assert chart_values(chart) == chart_values(UpSetAltair(data=sample_data, sets=sets))
+
+
+def test_from_counts(sample_data):
+    """Test building a chart from pre-aggregated intersection counts"""
+    sets = ["set1", "set2", "set3"]
+    counts = (
+        sample_data.groupby(sets).size().reset_index(name="n").sample(frac=1, random_state=0)
+    )
+    chart = UpSetAltair.from_counts(counts, sets=sets, count_col="n")
+    assert chart_values(chart) == chart_values(UpSetAltair(data=sample_data, sets=sets))
+
+
+def test_weighted_chart(sample_data):
+    """Test that a weighted chart carries the weighted intersection sizes"""
+    sets = ["set1", "set2", "set3"]
+    data = sample_data.assign(reads=[10, 20, 30, 40])
+    chart = UpSetAltair(data=data, sets=sets, weight="reads")
+    counts = {row["intersection_id"]: row["count"] for row in chart_values(chart)}
+    assert sorted(counts.values()) == [10, 20, 30, 40]
+
+
+def test_from_matrix(tmp_path):
+    """Test counting a memory-mapped membership matrix in windows"""
+    data = pd.read_csv(SYMPTOMS_CSV)
+    expected = chart_values(UpSetAltair(data=data, sets=SYMPTOMS))
+    matrix = data[SYMPTOMS].to_numpy(dtype=np.uint8)
+
+    np.save(tmp_path / "matrix.npy", matrix)
+    chart = UpSetAltair.from_matrix(tmp_path / "matrix.npy", sets=SYMPTOMS, chunksize=100)
+    assert chart_values(chart) == expected
+
+    matrix.tofile(tmp_path / "matrix.bin")
+    chart = UpSetAltair.from_matrix(
+        str(tmp_path / "matrix.bin"), sets=SYMPTOMS, chunksize=64, dtype=np.uint8
+    )
+    assert chart_values(chart) == expected
+
+    with pytest.raises(ValueError):
+        UpSetAltair.from_matrix(matrix, sets=SYMPTOMS[:-1])